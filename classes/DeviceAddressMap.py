@@ -0,0 +1,123 @@
+"""Contains a class that maps recorded events back to the populations of the device
+"""
+
+import numpy as np
+from DYNAPSETools.classes.EventsSet import _lookup
+from DYNAPSETools.parameters.dynapseParameters import dynapseStructure
+
+class DeviceAddressMap():
+    """Class that map every neuron address of the device to a population and to the index inside it
+    """
+
+    def __init__(self, *populations):
+        """Return a new DeviceAddressMap object
+
+Parameters:
+    *populations (list of obj DevicePopulation): Populations that must be recognized in the recorded events
+
+Note:
+    The map is a lookup table with one entry for every neuron of the device (4 chips x 4 cores x 256 neurons = 4096 entries),
+    indexed with the absolute neuron address::
+
+        absolute address = chip_id * 1024 + core_id * 256 + neuron_id
+
+    Every entry contains the index of the population in the populations list and the index of the neuron inside the
+    population (that is the index of the brian2 neuron, if the population has been created from a brian2 NeuronGroup).
+    Neurons that do not belong to any population have both values equal to -1.
+
+    A neuron cannot belong to two populations of the same map.
+
+Examples:
+    - Create the map of two populations and label the events of a recording::
+
+        p1 = DevicePopulation(chip_id = 0, core_id = 1, start_neuron = 0, size = 20, name = "p1")
+        p2 = DevicePopulation(chip_id = 0, core_id = 2, start_neuron = 0, size = 10, name = "p2")
+        addressMap = DeviceAddressMap(p1, p2)
+
+        set = import_events("recording.aedat") # event set of the recording
+        populationIds, localIndexes = addressMap.label_events(set)
+"""
+
+        self.populations = list(populations)
+
+        numNeurons = dynapseStructure["nChipPerDevice"] * dynapseStructure["nNeuronsPerChip"]
+        self.populationIds = np.full(numNeurons, -1, dtype = np.int16)
+        self.localIndexes = np.full(numNeurons, -1, dtype = np.int32)
+
+        for populationId, population in enumerate(self.populations):
+            for localIndex, neuron in enumerate(population.neurons):
+                address = (neuron.chip_id * dynapseStructure["nNeuronsPerChip"] +
+                           neuron.core_id * dynapseStructure["nNeuronsPerCore"] +
+                           neuron.neuron_id)
+                if (address < 0) | (address >= numNeurons):
+                    errorString = "Error while creating address map, neuron {} of population {} is outside the device".format(
+                        neuron.create_neuron_string(), population.name)
+                    raise NameError(errorString)
+                if self.populationIds[address] != -1:
+                    errorString = "Error while creating address map, neuron {} of population {} already belongs to population {}".format(
+                        neuron.create_neuron_string(), population.name, self.populations[self.populationIds[address]].name)
+                    raise NameError(errorString)
+                self.populationIds[address] = populationId
+                self.localIndexes[address] = localIndex
+
+        # Row of every neuron when all the populations are stacked in a single matrix
+        populationSizes = [len(population.neurons) for population in self.populations]
+        self.populationOffsets = np.concatenate(([0], np.cumsum(populationSizes, dtype = np.int64)))
+        self.rowsTable = np.where(self.populationIds >= 0,
+                                  self.populationOffsets[self.populationIds] + self.localIndexes,
+                                  -1)
+
+### ===========================================================================
+    def label_events(self, eventsSet):
+        """Return the population and the index inside the population of every event
+
+Parameters:
+    eventsSet (obj EventsSet): Set of events that must be labeled
+
+Returns:
+    (tuple): tuple containing:
+
+        - **populationIds** (*array, int*): Index of the population of every event (-1 if not in any population)
+        - **localIndexes** (*array, int*): Index of the neuron inside its population (-1 if not in any population)
+"""
+
+        absoluteNeurons = ((np.asarray(eventsSet.chip_id, dtype = np.int64) * dynapseStructure["nNeuronsPerChip"]) +
+                           (np.asarray(eventsSet.core_id, dtype = np.int64) * dynapseStructure["nNeuronsPerCore"]) +
+                           eventsSet.neuron_id)
+
+        return _lookup(self.populationIds, absoluteNeurons), _lookup(self.localIndexes, absoluteNeurons)
+
+### ===========================================================================
+    def calculate_firing_rate_matrix(self, eventsSet, numBins = 10, timeBin = None):
+        """Derive a firing rate matrix for every population starting from an EventsSet
+
+Parameters:
+    eventsSet (obj EventsSet): Set of events from which firing rate is calculated
+    numBins (int): Default parameter. Number of intervals in which firing rate must be evaluated
+    tBin (int, [s], optional): Amplitude of each interval in which firing rate must be evaluated
+
+Returns:
+    (tuple): tuple containing:
+
+        - **timeSteps** (*array, float*): Time steps in which firing rate has been calculated
+        - **populationsFireRate** (*list of 2D array, float*): For every population, the firing rate of
+          every neuron of the population (rows are in the order of the population) and for every time step
+
+Note:
+    Time bins are the same of EventsSet.calculate_firing_rate_matrix. All the events are counted in a single pass.
+
+Examples:
+    ::
+
+        addressMap = DeviceAddressMap(p1, p2)
+        timeSteps, (p1FireRate, p2FireRate) = addressMap.calculate_firing_rate_matrix(set, timeBin = 0.02)
+"""
+
+        timeBins, binSize = eventsSet._time_bins(numBins = numBins, timeBin = timeBin)
+        neuronsSpikes = eventsSet._count_events_in_bins(timeBins, self.populationOffsets[-1], rowsTable = self.rowsTable)
+        neuronsFireRate = neuronsSpikes / (binSize / 1e6)
+
+        populationsFireRate = [neuronsFireRate[self.populationOffsets[idx]:self.populationOffsets[idx + 1]]
+                               for idx in range(len(self.populations))]
+
+        return timeBins[:-1], populationsFireRate
@@ -3,6 +3,7 @@
 
 import numpy as np
 from matplotlib import pyplot as plt
+from DYNAPSETools.parameters.dynapseParameters import dynapseStructure
 
 class EventsSet:
     """A set of DYNAP-se events
@@ -231,54 +232,9 @@ Examples:
                                                   maxNumber = 5)
 """
         
-        # If absolute index, convert to tuple containing (core, neuron id)
-        #if not isinstance(startTriggerNeuron, collections.Iterable):
-        #    startTriggerCore = (int) (startTriggerNeuron / 256)
-        #    startTriggerNeuron = (startTriggerCore, startTriggerNeuron % (256 * startTriggerCore))
-        #if not isinstance(stopTriggerNeuron, collections.Iterable):
-        #    stopTriggerCore = (int) (stopTriggerNeuron / 256)
-        #    stopTriggerNeuron = (stopTriggerCore, stopTriggerNeuron % (256 * stopTriggerCore))
-        
-        # Find the index of the start trigger neurons or stop trigger neurons
-        startTriggerIndexes = np.where((self.chip_id == startTriggerNeuron[0]) &
-                                       (self.core_id == startTriggerNeuron[1]) &
-                                       (self.neuron_id == startTriggerNeuron[2]))[0]
-        stopTriggerIndexes = np.where((self.chip_id == stopTriggerNeuron[0]) &
-                                      (self.core_id == stopTriggerNeuron[1]) &
-                                      (self.neuron_id == stopTriggerNeuron[2]))[0]
-
-        # Setup experiment list
-        experiments = []
-
-        # Sweep over all requested experiments number
-        startTrigger = 0
-        stopTrigger = 0
-
-        # Initialize the number of experiments to be taken
-        counter = 0
-        if maxNumber == None:
-            limit = 0
-        else:
-            limit = maxNumber
-
-        while ((maxNumber == None) | (counter < limit)):
-            try:
-                # Calculate the start and stop trigger of the current experiment
-                startTrigger = startTriggerIndexes[startTriggerIndexes >= stopTrigger][0] # Start trigger should happen after the previous end trigger
-                stopTrigger = stopTriggerIndexes[stopTriggerIndexes >= startTrigger][0] # End trigger should happen after start trigger
-
-                # Filter the spikes information according to the previous range (the +1 is in order to take also the trigger spike)
-                # Start and stop trigger are included!
-                ts_event = self.ts[startTrigger:(stopTrigger+1)]
-                neuron_id_event = self.neuron_id[startTrigger:(stopTrigger+1)]
-                core_id_event = self.core_id[startTrigger:(stopTrigger+1)]
-                chip_id_event = self.chip_id[startTrigger:(stopTrigger+1)]
-
-                # Append experiment and increment counter
-                experiments.append(EventsSet(ts_event, chip_id_event, core_id_event, neuron_id_event))
-                counter = counter + 1
-            except:
-                break;
+        # Find the [start, stop) index of every experiment and take a set for each one
+        offsets = self.isolate_events_offsets(startTriggerNeuron, stopTriggerNeuron, maxNumber = maxNumber)
+        experiments = [self[init, end] for init, end in offsets]
 
         # Check if there are experiments in the list
         if len(experiments) == 0:
@@ -289,6 +245,135 @@ Examples:
             print("Extracted {} experiments".format(len(experiments)))
             return experiments
 
+### ===========================================================================
+    def isolate_events_offsets(self, startTriggerNeuron, stopTriggerNeuron, maxNumber = None):
+        """Returns the indexes of the events of every experiment, without copying them
+
+Parameters:
+    startTriggerNeuron (tuple, int (chip id, core id, neuron id)): Neuron which events triggers the start of the experiment
+    stopTriggerNeuron (tuple, int (chip id, core id, neuron id)). Neuron which events trigger the end of the experiment
+    maxNumber (int): max number of experiments that can be extracted from the Set of events
+
+Returns:
+    2D array, int: a (experiments, 2) array; every row contains the index of the start trigger event and the index
+    after the stop trigger event of an experiment
+
+Note:
+    Experiments are the same of isolate_events_sets (see it for details), that is equivalent to::
+
+        experiments = [set[init, end] for init, end in set.isolate_events_offsets(startTriggerNeuron, stopTriggerNeuron)]
+
+    No error is raised if no experiment is found, an empty table is returned instead.
+"""
+        
+        offsets, conditions = self.segment_events(startTriggerNeuron, stopTriggerNeuron, maxNumber = maxNumber, labels = False)
+        return offsets
+
+### ===========================================================================
+    def segment_events(self, startTriggerNeuron, stopTriggerNeuron, conditionNeurons = None, maxNumber = None, labels = True):
+        """Segment the events in experiments (trials), using marker neurons
+
+Parameters:
+    startTriggerNeuron (tuple, int (chip id, core id, neuron id); list of tuples): Neurons which events trigger the start of an experiment
+    stopTriggerNeuron (tuple, int (chip id, core id, neuron id); list of tuples): Neurons which events trigger the end of an experiment
+    conditionNeurons (list of tuples, int (chip id, core id, neuron id), optional): Neurons which events encode the condition
+        of the experiment. The condition id is the position of the neuron in the list
+    maxNumber (int, optional): max number of experiments that can be extracted from the Set of events
+    labels (bool, optional): If True, return also the experiment of every event
+
+Returns:
+    (tuple): tuple containing:
+
+        - **offsets** (*2D array, int*): a (experiments, 2) array; every row contains the index of the start trigger
+          event and the index after the stop trigger event of an experiment
+        - **conditions** (*array, int*): condition id of every experiment (-1 if no condition neuron fired)
+        - **eventsLabels** (*array, int*): only if labels is True, experiment id of every event (-1 if outside experiments)
+
+Note:
+    Experiments are found as in isolate_events_sets: an experiment starts with the first start trigger event after the end
+    of the previous experiment and ends with the first stop trigger event after its start. Start and stop may be more than
+    one neuron: any of them triggers the start (or the stop).
+
+    The condition of an experiment is given by the last condition neuron event that happens after the end of the previous
+    experiment and before the stop trigger event (so condition neurons can fire before or inside the experiment).
+
+    All the markers are found in a single pass over the events, with a lookup table of the neuron addresses, and no event
+    is copied: use offsets to take the experiments (set[init, end]) or the labels to group events.
+
+Examples:
+    - Experiments start with neuron 64 of core 2 and stop with neuron 128 of core 2, while neurons 10, 11 and 12 of core 3
+      encode the condition (0, 1 or 2) of every experiment::
+
+        set = import_events("recording.aedat") # event set of the recording
+        offsets, conditions, eventsLabels = set.segment_events(startTriggerNeuron = (0, 2, 64),
+                                                               stopTriggerNeuron = (0, 2, 128),
+                                                               conditionNeurons = [(0, 3, 10), (0, 3, 11), (0, 3, 12)])
+        firstExperiment = set[offsets[0, 0], offsets[0, 1]]
+"""
+
+        # Lookup table with the marker code of every neuron: 0 start, 1 stop, 2 + k condition k, -1 no marker
+        markerTable = np.full(4096, -1, dtype = np.int16)
+        markers = [(neuron, 0) for neuron in _neurons_list(startTriggerNeuron)]
+        markers += [(neuron, 1) for neuron in _neurons_list(stopTriggerNeuron)]
+        if conditionNeurons is not None:
+            markers += [(neuron, 2 + conditionId) for conditionId, neuron in enumerate(conditionNeurons)]
+        for neuron, code in markers:
+            address = neuron[0] * 1024 + neuron[1] * 256 + neuron[2]
+            if markerTable[address] != -1:
+                errorString = "Error while segmenting events, neuron {} is used for more than one marker".format(neuron)
+                raise NameError(errorString)
+            markerTable[address] = code
+
+        # Single pass over the events
+        markerIndexes, markerCodes = self._find_marker_events(markerTable)
+        startTriggerIndexes = markerIndexes[markerCodes == 0]
+        stopTriggerIndexes = markerIndexes[markerCodes == 1]
+
+        # Setup offsets list
+        offsets = []
+
+        # Sweep over all requested experiments number
+        stopTrigger = 0
+        while (maxNumber == None) or (len(offsets) < maxNumber):
+            # Start trigger should happen after the previous end trigger
+            pos = np.searchsorted(startTriggerIndexes, stopTrigger)
+            if pos == len(startTriggerIndexes):
+                break
+            startTrigger = startTriggerIndexes[pos]
+
+            # End trigger should happen after start trigger
+            pos = np.searchsorted(stopTriggerIndexes, startTrigger)
+            if pos == len(stopTriggerIndexes):
+                break
+            stopTrigger = stopTriggerIndexes[pos]
+
+            # Start and stop trigger are included! (the +1 is in order to take also the stop trigger spike)
+            offsets.append((startTrigger, stopTrigger + 1))
+
+        offsets = np.array(offsets, dtype = np.int64).reshape((-1, 2))
+
+        # Condition of every experiment: last condition event before the stop trigger, after the previous experiment
+        conditionIndexes = markerIndexes[markerCodes >= 2]
+        conditionCodes = markerCodes[markerCodes >= 2] - 2
+        lastCondition = np.searchsorted(conditionIndexes, offsets[:, 1] - 1) - 1
+        previousEnds = np.concatenate(([0], offsets[:-1, 1]))
+        valid = (lastCondition >= 0)
+        valid[valid] &= conditionIndexes[lastCondition[valid]] >= previousEnds[valid]
+        conditions = np.full(len(offsets), -1, dtype = np.int64)
+        conditions[valid] = conditionCodes[lastCondition[valid]]
+
+        if not labels:
+            return offsets, conditions
+
+        # Experiment of every event: experiments and the gaps between them (-1) are consecutive ranges of events,
+        # so labels are created with a single repeat, without temporary arrays as long as the set
+        boundaries = np.concatenate(([0], offsets.ravel(), [len(self.ts)]))
+        rangeLabels = np.full(2 * len(offsets) + 1, -1, dtype = np.int32 if len(offsets) < 2**31 else np.int64)
+        rangeLabels[1::2] = np.arange(len(offsets))
+        eventsLabels = np.repeat(rangeLabels, np.diff(boundaries))
+
+        return offsets, conditions, eventsLabels
+
 ### ===========================================================================
     def plot_events(self, ax = None):
         """Raster plot of events included in the current EventsSet
@@ -355,13 +440,107 @@ Examples:
         return fig, ax, handles
 
 ### ===========================================================================
-    def calculate_firing_rate_matrix(self, totNeurons, numBins = 10, timeBin = None):
+    def address_counts(self, duration = None):
+        """Count the events of every neuron of the device
+
+Parameters:
+    duration (float, [s], optional): Duration used to calculate the rates. If None, time between first and last event
+
+Returns:
+    (tuple): tuple containing:
+
+        - **counts** (*3D array, int*): Number of events of every neuron, indexed as counts[chip_id, core_id, neuron_id]
+        - **rates** (*3D array, float*): Firing rate [Hz] of every neuron, with the same indexing
+
+Note:
+    All the events are counted with a single bincount over the absolute address of the neuron
+    (chip_id * 1024 + core_id * 256 + neuron_id), so it is fast also for very big recordings.
+    It is useful to find dead or saturated neurons.
+
+Examples:
+    ::
+
+        set = import_events("recording.aedat") # event set of the recording
+        counts, rates = set.address_counts()
+        deadNeurons = np.argwhere(counts == 0) # (chip_id, core_id, neuron_id) of the neurons without events
+"""
+
+        shape = (dynapseStructure["nChipPerDevice"], dynapseStructure["nCoresPerChip"], dynapseStructure["nNeuronsPerCore"])
+        counts = self._count_events_in_bins(np.array([-np.inf, np.inf]), int(np.prod(shape))).reshape(shape)
+
+        if duration == None:
+            duration = (self.ts[-1] - self.ts[0]) / 1e6 if len(self.ts) > 1 else 0
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            rates = counts / duration
+
+        return counts, rates
+
+### ===========================================================================
+    def plot_address_heatmap(self, rates = True, duration = None, ax = None):
+        """Plot a heatmap of the activity of every neuron of the device
+
+Parameters:
+    rates (bool, optional): If True plot the firing rates [Hz], otherwise the number of events
+    duration (float, [s], optional): Duration used to calculate the rates (see address_counts)
+    ax (ax handle, optional): Plot graph on this handle, otherwise a new figure will be created
+
+Returns:
+    (tuple): tuple containing:
+
+        - **fig** (*fig handles*): To modify properties of the figure
+        - **ax** (*ax handles*): To modify properties of the plot
+        - **handle** (*image handle*): To create a colorbar
+
+Note:
+    Every core is a 16x16 square of neurons (neuron_id = row * 16 + column), cores are placed in a 2x2 grid inside
+    the chip (core 0 top left, core 1 top right, core 2 bottom left, core 3 bottom right) and chips are placed in the
+    same way in the device.
+
+Examples:
+    ::
+
+        set = import_events("recording.aedat") # event set of the recording
+        fig, ax, handle = set.plot_address_heatmap()
+        fig.colorbar(handle, ax = ax)
+"""
+
+        counts, neuronsRates = self.address_counts(duration = duration)
+        values = neuronsRates if rates else counts
+
+        # Place neurons in the grid
+        coreSide = int(np.sqrt(dynapseStructure["nNeuronsPerCore"]))
+        chipSide = 2 * coreSide
+        image = np.zeros((2 * chipSide, 2 * chipSide))
+        for chip in range(dynapseStructure["nChipPerDevice"]):
+            for core in range(dynapseStructure["nCoresPerChip"]):
+                row = (chip // 2) * chipSide + (core // 2) * coreSide
+                column = (chip % 2) * chipSide + (core % 2) * coreSide
+                image[row:row + coreSide, column:column + coreSide] = values[chip, core].reshape((coreSide, coreSide))
+
+        fig = None
+
+        # If no subplot is specified, create new plot
+        if ax == None:
+            fig = plt.figure()
+            ax = fig.add_subplot(111)
+
+        handle = ax.imshow(image, interpolation = 'nearest')
+        for pos in range(1, 4): # Lines between cores (thin) and chips (thick)
+            ax.axhline(pos * coreSide - 0.5, color = 'w', linewidth = 2 if pos == 2 else 0.5)
+            ax.axvline(pos * coreSide - 0.5, color = 'w', linewidth = 2 if pos == 2 else 0.5)
+
+        return fig, ax, handle
+
+### ===========================================================================
+    def calculate_firing_rate_matrix(self, totNeurons, numBins = 10, timeBin = None, window = None, step = None):
         """Derive a firing rate matrix starting from the current EventSet
         
 Parameters:
     totNeurons (int): Maximum number of neurons for which firing rate is calculated (from id = 0 to totNeuron number)
     numBins (int): Default parameter. Number of intervals in which firing rate must be evaluated
     tBin (int, [s], optional): Amplitude of each interval in which firing rate must be evaluated
+    window (float, [s], optional): Amplitude of overlapping intervals in which firing rate must be evaluated
+    step (float, [s], optional): Time between the start of two consecutive overlapping intervals (default is window)
 
 Returns:
     (tuple): tuple containing:
@@ -391,6 +570,11 @@ Note:
     | neuron n   | 20           | 10             | ...           | 10             |
     +------------+--------------+----------------+---------------+----------------+
 
+    If window is specified, numBins and tBin are ignored and the firing rate is evaluated in overlapping intervals
+    [t0+k*step, t0+k*step+window), for all the windows that are inside the events set. window must be a multiple of step.
+    Spikes are counted only once at step resolution, and the spikes of every window are obtained from the difference
+    of cumulative sums, so the cost does not depend on the overlap.
+
 Examples:
     ::
 
@@ -404,47 +588,479 @@ Examples:
         # obtain firing rate from bin size
         timeSteps, neuronsFireRate = set.calculate_firing_rate_matrix(totNeurons = 1024,
                                                                       timeBin = 0.02)
+
+        # obtain firing rate in 200 ms windows every 10 ms
+        timeSteps, neuronsFireRate = set.calculate_firing_rate_matrix(totNeurons = 1024,
+                                                                      window = 0.2, step = 0.01)
 """
         
-        # Initialize vectors
-        timeSteps = []
-        #neuronSpikes = [[] for count in np.arange(totNeurons)]
-        neuronsFireRate = [[] for count in np.arange(totNeurons)]
-        absoluteNeurons = (self.chip_id * 1024) + (self.core_id * 256) + self.neuron_id
+        if window != None:
+            return self._calculate_window_firing_rate_matrix(totNeurons, window, step)
+
+        # Calculate time bins and count the spikes of every neuron in every bin
+        timeBins, binSize = self._time_bins(numBins = numBins, timeBin = timeBin)
+        neuronsSpikes = self._count_events_in_bins(timeBins, totNeurons)
+
+        # Do the average in all neurons
+        timeSteps = timeBins[:-1]
+        neuronsFireRate = neuronsSpikes / (binSize / 1e6)
+
+        return timeSteps, neuronsFireRate
+
+### ===========================================================================
+    def _calculate_window_firing_rate_matrix(self, totNeurons, window, step = None):
+        """Firing rate matrix over overlapping windows, see calculate_firing_rate_matrix
+"""
+
+        if step == None:
+            step = window
+        stepsPerWindow = int(np.round(window / step))
+        if (stepsPerWindow < 1) | (not np.isclose(stepsPerWindow * step, window)):
+            errorString = "Error while calculating firing rate matrix, window ({}) must be a multiple of step ({})".format(window, step)
+            raise NameError(errorString)
+
+        # Count spikes once at step resolution, windows are differences of the cumulative counts
+        timeBins, binSize = self._time_bins(timeBin = step)
+        numBins = len(timeBins) - 1
+        if numBins < stepsPerWindow:
+            errorString = "Error while calculating firing rate matrix, window ({}) is longer than the events set".format(window)
+            raise NameError(errorString)
+        cumulativeSpikes = np.zeros((totNeurons, numBins + 1), dtype = np.int64)
+        np.cumsum(self._count_events_in_bins(timeBins, totNeurons), axis = 1, out = cumulativeSpikes[:, 1:])
+        neuronsSpikes = cumulativeSpikes[:, stepsPerWindow:] - cumulativeSpikes[:, :-stepsPerWindow]
+
+        timeSteps = timeBins[:numBins - stepsPerWindow + 1]
+        neuronsFireRate = neuronsSpikes / (stepsPerWindow * binSize / 1e6)
+
+        return timeSteps, neuronsFireRate
+
+### ===========================================================================
+    def calculate_psth(self, binSize, window, onsets = None, triggerNeuron = None, totNeurons = 1024, neuronGroups = None):
+        """Derive the peri-stimulus time histogram (PSTH) of every neuron, averaged over trials
+
+Parameters:
+    binSize (float, [s]): Amplitude of each interval of the histogram
+    window (tuple, float, [s]): (start, stop) of the histogram, relative to the trial onset (start can be negative)
+    onsets (array, float, [us], optional): Onset times of the trials
+    triggerNeuron (tuple, int (chip id, core id, neuron id), optional): Neuron which events are the onsets of the trials (alternative to onsets)
+    totNeurons (int, optional): Maximum number of neurons for which PSTH is calculated (from id = 0 to totNeuron number)
+    neuronGroups (list of lists, int, optional): If specified, PSTH is calculated for every group of absolute neuron ids
+        (chip_id * 1024 + core_id * 256 + neuron_id) instead of every neuron, and it is the mean over the neurons of the group.
+        Groups can overlap: a neuron that belongs to several groups is counted in each of them
+
+Returns:
+    (tuple): tuple containing:
+
+        - **timeSteps** (*array, float*): Start time [us] of every bin, relative to the onset
+        - **psth** (*2D array, float*): Mean firing rate [Hz] of every neuron (or group) in every bin, over the trials
+        - **psthError** (*2D array, float*): Standard error of the mean firing rate over the trials
+
+Note:
+    Every event is assigned to its trial with a binary search of the onsets, and the counts of every (trial, neuron, bin)
+    are obtained all together, so there is no loop over the trials.
+
+    If the windows of some trials overlap (window longer than the interval between trials), every event is counted in
+    all the windows it falls into: the search is repeated for the previous trials, as many times as the maximum number
+    of overlapping windows.
+
+Examples:
+    - PSTH from 100 ms before to 500 ms after every event of neuron 64 of core 2, with 10 ms bins::
+
+        set = import_events("recording.aedat") # event set of the recording
+        timeSteps, psth, psthError = set.calculate_psth(binSize = 0.01, window = (-0.1, 0.5),
+                                                        triggerNeuron = (0, 2, 64))
+
+    - Same PSTH for two groups of neurons::
+
+        groups = [list(range(0, 100)), list(range(256, 356))] # neurons 0-99 of core 0 and 1
+        timeSteps, psth, psthError = set.calculate_psth(binSize = 0.01, window = (-0.1, 0.5),
+                                                        triggerNeuron = (0, 2, 64), neuronGroups = groups)
+"""
+
+        if triggerNeuron is not None:
+            markerTable = np.full(4096, -1, dtype = np.int16)
+            markerTable[triggerNeuron[0] * 1024 + triggerNeuron[1] * 256 + triggerNeuron[2]] = 0
+            onsets = np.asarray(self.ts)[self._find_marker_events(markerTable)[0]]
+        elif onsets is None:
+            errorString = "Error while calculating PSTH, specify onsets or triggerNeuron"
+            raise NameError(errorString)
+        onsets = np.sort(np.asarray(onsets, dtype = np.float64))
+        numTrials = len(onsets)
+        if numTrials == 0:
+            errorString = "Error while calculating PSTH, no trial onset found"
+            raise NameError(errorString)
+
+        binUs = binSize * 1e6
+        startUs = window[0] * 1e6
+        numBins = int(np.round((window[1] - window[0]) / binSize))
+
+        # Row of every event
+        absoluteNeurons = (np.asarray(self.chip_id, dtype = np.int64) * 1024) + (np.asarray(self.core_id, dtype = np.int64) * 256) + self.neuron_id
+        ts = np.asarray(self.ts)
+        if neuronGroups is not None:
+            numRows = len(neuronGroups)
+            groupSizes = np.array([len(group) for group in neuronGroups], dtype = np.int64)
+            # (neuron, group) pairs sorted by neuron, every event is repeated once for every group of its neuron
+            members = np.concatenate([np.asarray(group, dtype = np.int64).ravel() for group in neuronGroups] + [np.zeros(0, dtype = np.int64)])
+            memberRows = np.repeat(np.arange(numRows), groupSizes)
+            order = np.argsort(members, kind = 'stable')
+            members = members[order]
+            memberRows = memberRows[order]
+            memberCounts = np.bincount(members, minlength = 4096)
+            firstMember = np.cumsum(memberCounts) - memberCounts
+            eventCounts = np.maximum(_lookup(memberCounts, absoluteNeurons), 0)
+            eventIndexes = np.repeat(np.arange(len(absoluteNeurons)), eventCounts)
+            pairOffsets = np.arange(len(eventIndexes)) - np.repeat(np.cumsum(eventCounts) - eventCounts, eventCounts)
+            rows = memberRows[firstMember[absoluteNeurons[eventIndexes]] + pairOffsets]
+            ts = ts[eventIndexes]
+            groupSizes = groupSizes.reshape((-1, 1))
+        else:
+            numRows = totNeurons
+            rows = absoluteNeurons
+            groupSizes = 1
+
+        # Maximum number of windows that contain the same time
+        windowStarts = onsets + startUs
+        windowLength = numBins * binUs
+        overlaps = np.arange(numTrials) - np.searchsorted(windowStarts, windowStarts - windowLength, side = 'right') + 1
+        maxOverlaps = int(overlaps.max())
+
+        # Trial and relative bin of every event, for the most recent trial and the previous overlapping ones
+        lastTrials = np.searchsorted(windowStarts, ts, side = 'right') - 1
+        validRows = (rows >= 0) & (rows < numRows)
+        eventTrials = []
+        eventRows = []
+        eventBins = []
+        for previous in range(maxOverlaps):
+            trials = lastTrials - previous
+            valid = (trials >= 0) & validRows
+            trials = trials[valid]
+            bins = np.floor((ts[valid] - windowStarts[trials]) / binUs).astype(np.int64)
+            inWindow = bins < numBins
+            eventTrials.append(trials[inWindow])
+            eventRows.append(rows[valid][inWindow])
+            eventBins.append(bins[inWindow])
+        trials = np.concatenate(eventTrials)
+        rows = np.concatenate(eventRows)
+        bins = np.concatenate(eventBins)
+
+        # Counts of every (trial, row, bin), then sum and sum of squares over trials
+        keys, counts = np.unique((trials * numRows + rows) * numBins + bins, return_counts = True)
+        cells = keys % (numRows * numBins)
+        sums = np.bincount(cells, weights = counts, minlength = numRows * numBins).reshape((numRows, numBins))
+        squares = np.bincount(cells, weights = counts.astype(np.float64)**2, minlength = numRows * numBins).reshape((numRows, numBins))
+
+        mean = sums / numTrials
+        if numTrials > 1:
+            variance = np.maximum(squares - numTrials * mean**2, 0) / (numTrials - 1)
+            error = np.sqrt(variance / numTrials)
+        else:
+            error = np.zeros_like(mean)
+
+        timeSteps = startUs + np.arange(numBins) * binUs
+        scale = 1 / (binSize * groupSizes)
+
+        return timeSteps, mean * scale, error * scale
+
+### ===========================================================================
+    def calculate_smoothed_firing_rate(self, totNeurons, kernel = "gaussian", tau = 0.01, resolution = 0.001, method = "fft", dtype = np.float32):
+        """Derive an instantaneous firing rate matrix, smoothing the spikes with a kernel
+
+Parameters:
+    totNeurons (int): Maximum number of neurons for which firing rate is calculated (from id = 0 to totNeuron number)
+    kernel (string, optional): Shape of the smoothing kernel: "gaussian", "exponential" or "alpha"
+    tau (float, [s], optional): Time constant of the kernel (standard deviation for the gaussian one)
+    resolution (float, [s], optional): Time step of the output firing rate
+    method (string, optional): "fft" for FFT convolution, "recursive" for recursive filters (only exponential and alpha)
+    dtype (numpy dtype, optional): dtype of the output matrix
+
+Returns:
+    (tuple): tuple containing:
+
+        - **timeSteps** (*array, float*): Time steps in which firing rate has been calculated
+        - **neuronsFireRate** (*2D array, dtype*): Contain firing rate [Hz] for every neuron and for every time step
+
+Note:
+    The spikes of every neuron are counted in bins of amplitude resolution (as calculate_firing_rate_matrix with
+    timeBin = resolution) and then every row is convolved with a kernel of unitary area, so the cost depends on the number
+    of events plus the number of bins, not on their product. The kernels are::
+
+        - gaussian: exp(-t^2 / (2 tau^2)), centered on the spike
+        - exponential: exp(-t / tau) for t >= 0 (causal)
+        - alpha: t / tau * exp(-t / tau) for t >= 0 (causal)
+
+    With method = "fft" the kernel is truncated at 4 tau (gaussian), 8 tau (exponential) or 10 tau (alpha).
+    With method = "recursive" the exponential kernel is applied as a first order filter and the alpha kernel as two
+    exponential filters in cascade (this is equivalent to an alpha kernel delayed of one time step).
+
+Examples:
+    ::
+
+        # Initialize set importing all events
+        set = import_events("recording.aedat") # event set of the recording
+
+        # gaussian kernel with 20 ms standard deviation, rate every 1 ms
+        timeSteps, neuronsFireRate = set.calculate_smoothed_firing_rate(totNeurons = 1024, kernel = "gaussian",
+                                                                        tau = 0.02, resolution = 0.001)
+
+        # exponential kernel with 50 ms time constant, with recursive filter
+        timeSteps, neuronsFireRate = set.calculate_smoothed_firing_rate(totNeurons = 1024, kernel = "exponential",
+                                                                        tau = 0.05, method = "recursive")
+"""
+
+        if kernel not in ("gaussian", "exponential", "alpha"):
+            errorString = "Error while calculating smoothed firing rate, kernel {} does not exist".format(kernel)
+            raise NameError(errorString)
+        if method not in ("fft", "recursive"):
+            errorString = "Error while calculating smoothed firing rate, method {} does not exist".format(method)
+            raise NameError(errorString)
+        if (method == "recursive") & (kernel == "gaussian"):
+            errorString = "Error while calculating smoothed firing rate, gaussian kernel cannot be applied with recursive method"
+            raise NameError(errorString)
+
+        # Count spikes at the output resolution directly in the output matrix (dtype can be a scalar type or a dtype instance)
+        dtype = np.dtype(dtype)
+        timeBins, binSize = self._time_bins(timeBin = resolution)
+        numBins = len(timeBins) - 1
+        neuronsFireRate = np.zeros((totNeurons, numBins), dtype = dtype)
+        self._count_events_in_bins(timeBins, totNeurons, out = neuronsFireRate)
+        neuronsFireRate /= dtype.type(binSize / 1e6) # Spike density in [Hz]
+        tauBins = tau / resolution
+
+        if method == "fft":
+            # Sample the kernel and normalize it to unitary area
+            if kernel == "gaussian":
+                halfSize = int(np.ceil(4 * tauBins))
+                t = np.arange(-halfSize, halfSize + 1)
+                kernelValues = np.exp(-t**2 / (2 * tauBins**2))
+                shift = halfSize
+            elif kernel == "exponential":
+                t = np.arange(int(np.ceil(8 * tauBins)) + 1)
+                kernelValues = np.exp(-t / tauBins)
+                shift = 0
+            else:
+                t = np.arange(int(np.ceil(10 * tauBins)) + 1)
+                kernelValues = t / tauBins * np.exp(-t / tauBins)
+                shift = 0
+            kernelValues = kernelValues / np.sum(kernelValues)
+
+            # Convolve only rows with spikes (from the total count of every neuron), in blocks to limit the memory used by the transforms
+            activeRows = np.flatnonzero(self._count_events_in_bins(timeBins[[0, -1]], totNeurons)[:, 0])
+            fftSize = 1 << int(np.ceil(np.log2(numBins + len(kernelValues) - 1)))
+            kernelFft = np.fft.rfft(kernelValues, fftSize)
+            blockSize = max(1, 2**22 // fftSize)
+            for init in range(0, len(activeRows), blockSize):
+                rows = activeRows[init:init + blockSize]
+                rowsFft = np.fft.rfft(neuronsFireRate[rows], fftSize, axis = 1)
+                convolved = np.fft.irfft(rowsFft * kernelFft, fftSize, axis = 1)
+                neuronsFireRate[rows] = convolved[:, shift:shift + numBins]
+        else:
+            # First order filters: y[n] = decay * y[n - 1] + (1 - decay) * x[n]
+            decay = dtype.type(np.exp(-1 / tauBins))
+            numFilters = 1 if kernel == "exponential" else 2
+            for _ in range(numFilters):
+                neuronsFireRate *= (1 - decay)
+                for pos in range(1, numBins):
+                    neuronsFireRate[:, pos] += decay * neuronsFireRate[:, pos - 1]
+
+        return timeBins[:-1], neuronsFireRate
+
+### ===========================================================================
+    def _time_bins(self, numBins = 10, timeBin = None):
+        """Return the edges of the time bins and their amplitude in [us]
+"""
 
-        # Calculate time bins
         if timeBin != None: # If time bin is fixed and the number of bins are variable
             binSize = timeBin * 1000000 # Transform in [us]
-            time = self.ts[0]
-            timeBins = [time]
-            while time <= self.ts[-1]:
-                time += binSize
-                timeBins.append(time)
+            # Bins are added until the last event is included
+            numBins = int(np.floor((self.ts[-1] - self.ts[0]) / binSize)) + 1
+            timeBins = self.ts[0] + np.arange(numBins + 1) * binSize
         else: # If time bin is variable and the number of bins are fixed
             timeBins, binSize = np.linspace(self.ts[0], self.ts[-1], numBins + 1, retstep = True)
-        timeBins = [(timeBins[i], timeBins[i + 1]) for i in range(len(timeBins) - 1)]
-        
-        # Sweep over the time bins and calculate spikes and firing rate
-        for timeBin in timeBins:
-            timeSteps.append(timeBin[0])
-            # Initialize to 0 the firing rate of all neurons
-            for pos in np.arange(totNeurons): 
-                #neuronSpikes[pos].append(0)
-                neuronsFireRate[pos].append(0)
-            # Find the spikes in the time Bin
-            spanInterval = np.where((self.ts >= timeBin[0]) & (self.ts < timeBin[1]))[0]
-            # Span the spikes and increment the spike counter in the neuron list
-            for pos in spanInterval:
-                #neuronSpikes[absoluteNeurons[pos]][-1] += 1
-                try:
-                    neuronsFireRate[absoluteNeurons[pos]][-1] += 1
-                except:
-                    pass
-            for pos in range(totNeurons): # Do the average in all neurons
-                #neuronFireRate[pos][-1] = neuronSpikes[pos][-1] / (binSize / 1e6)
-                neuronsFireRate[pos][-1] = neuronsFireRate[pos][-1] / (binSize / 1e6)
-
-        return np.array(timeSteps), np.array(neuronsFireRate)
+
+        return timeBins, binSize
+
+### ===========================================================================
+    def _count_events_in_bins(self, timeBins, totNeurons, rowsTable = None, out = None):
+        """Return a (totNeurons, bins) matrix with the number of events of every neuron in every time bin
+
+If rowsTable is specified, the row of every event is rowsTable[absolute neuron] instead of the absolute neuron.
+If out is specified, counts are added to it (of any dtype) without creating a dense matrix of counts
+"""
+
+        return _bin_counts(self.ts, self.chip_id, self.core_id, self.neuron_id, timeBins, totNeurons, rowsTable, out)
+
+### ===========================================================================
+    def _find_marker_events(self, markerTable):
+        """Return the indexes and the markerTable values of the events of neurons with non negative markerTable value
+"""
+
+        absoluteNeurons = (np.asarray(self.chip_id, dtype = np.int64) * 1024) + (np.asarray(self.core_id, dtype = np.int64) * 256) + self.neuron_id
+        codes = _lookup(markerTable, absoluteNeurons)
+        indexes = np.flatnonzero(codes >= 0)
+        return indexes, codes[indexes]
+
+### ===========================================================================
+    def clean(self, minIsi = 1):
+        """Return a EventsSet without the events of a neuron that are too close to its previous event
+
+Parameters:
+    minIsi (float, [us], optional): Minimum interval between two events of the same neuron
+
+Returns:
+    obj EventsSet: A set containing only the valid events, in the same time order
+
+Note:
+    Hardware and USB glitches can produce duplicated events or events of the same neuron that are physically
+    impossible (closer than the refractory period). An event is removed if the last kept event of the same neuron
+    happened less than minIsi before it, so a train of glitches does not remove the following valid events.
+
+    With the default minIsi = 1 only the events with the same neuron and the same time of another one are removed.
+
+    Events are grouped by neuron with a stable sort of the addresses. Events farther than minIsi from the previous
+    event of their neuron are always kept, so only the events closer than minIsi are scanned one by one.
+
+Examples:
+    - Remove events that happen less than 100 us after another event of the same neuron::
+
+        set = import_events("recording.aedat") # event set of the recording
+        cleanSet = set.clean(minIsi = 100)
+"""
+
+        if len(self.ts) < 2:
+            return self
+
+        # Group events by neuron, keeping time order inside every group
+        absoluteNeurons = (np.asarray(self.chip_id, dtype = np.int64) * 1024) + (np.asarray(self.core_id, dtype = np.int64) * 256) + self.neuron_id
+        if absoluteNeurons.max() < 2**16:
+            absoluteNeurons = absoluteNeurons.astype(np.uint16) # Sort is linear for small integers
+        order = np.argsort(absoluteNeurons, kind = 'stable')
+        sortedNeurons = absoluteNeurons[order]
+        sortedTs = np.asarray(self.ts)[order]
+
+        # Events too close to the previous event of the same neuron, compared with the last kept event
+        closeIndexes = np.flatnonzero((sortedNeurons[1:] == sortedNeurons[:-1]) & ((sortedTs[1:] - sortedTs[:-1]) < minIsi)) + 1
+        tsList = sortedTs.tolist()
+        removed = []
+        previous = -2
+        for index in closeIndexes.tolist():
+            if index != previous + 1:
+                lastKept = tsList[index - 1] # First close event after a kept one
+            if tsList[index] - lastKept < minIsi:
+                removed.append(index)
+            else:
+                lastKept = tsList[index]
+            previous = index
+        keep = np.ones(len(self.ts), dtype = bool)
+        keep[order[np.array(removed, dtype = np.int64)]] = False
+
+        return EventsSet(self.ts[keep], self.chip_id[keep], self.core_id[keep], self.neuron_id[keep])
+
+### ===========================================================================
+    def detect_bursts(self, window = 0.01, step = None, maxCoreRate = None, maxChipRate = None):
+        """Find the time intervals in which a core or a chip fires too much (runaway excitation)
+
+Parameters:
+    window (float, [s], optional): Amplitude of the windows in which event rates are evaluated
+    step (float, [s], optional): Time between the start of two consecutive windows (default is window)
+    maxCoreRate (float, [Hz], optional): Maximum rate of events of a whole core
+    maxChipRate (float, [Hz], optional): Maximum rate of events of a whole chip
+
+Returns:
+    structured array: one row for every flagged interval, ordered by start time, with fields:
+
+        - **start** (*float, [us]*): start of the interval
+        - **stop** (*float, [us]*): end of the interval
+        - **chip_id** (*int*): chip that exceeded the threshold
+        - **core_id** (*int*): core that exceeded the threshold (-1 if the chip threshold was exceeded)
+        - **peakRate** (*float, [Hz]*): maximum rate of events in the interval
+
+Note:
+    Rates of every core are calculated in overlapping windows from the cumulative counts of the events at step
+    resolution (see calculate_firing_rate_matrix with window), so the whole set is read once. Consecutive windows above
+    the threshold are joined in a single interval.
+
+    The intervals can be removed, or decimated, with remove_bursts.
+
+Examples:
+    - Find the intervals in which a core fires more than 100 kHz, with 10 ms windows every 1 ms, and remove them::
+
+        set = import_events("recording.aedat") # event set of the recording
+        bursts = set.detect_bursts(window = 0.01, step = 0.001, maxCoreRate = 1e5)
+        cleanSet = set.remove_bursts(bursts)
+"""
+
+        numChips = dynapseStructure["nChipPerDevice"]
+        numCores = dynapseStructure["nCoresPerChip"]
+        numRows = numChips * numCores
+        rowsTable = np.arange(numChips * dynapseStructure["nNeuronsPerChip"]) // dynapseStructure["nNeuronsPerCore"]
+
+        if step == None:
+            step = window
+        stepsPerWindow = int(np.round(window / step))
+
+        # Events of every core in overlapping windows, from cumulative counts
+        timeBins, binSize = self._time_bins(timeBin = step)
+        numBins = len(timeBins) - 1
+        stepsPerWindow = min(max(stepsPerWindow, 1), numBins)
+        cumulativeCounts = np.zeros((numRows, numBins + 1), dtype = np.int64)
+        np.cumsum(self._count_events_in_bins(timeBins, numRows, rowsTable = rowsTable), axis = 1, out = cumulativeCounts[:, 1:])
+        coreRates = (cumulativeCounts[:, stepsPerWindow:] - cumulativeCounts[:, :-stepsPerWindow]) / (stepsPerWindow * binSize / 1e6)
+        chipRates = coreRates.reshape((numChips, numCores, -1)).sum(axis = 1)
+        windowStarts = timeBins[:numBins - stepsPerWindow + 1]
+        windowSize = stepsPerWindow * binSize
+
+        bursts = []
+        for rates, maxRate, isCore in ((coreRates, maxCoreRate, True), (chipRates, maxChipRate, False)):
+            if maxRate == None:
+                continue
+            # Start and end window of every run of windows above threshold
+            flags = np.zeros((rates.shape[0], rates.shape[1] + 2), dtype = np.int8)
+            flags[:, 1:-1] = rates > maxRate
+            edges = np.diff(flags, axis = 1)
+            runRows, runStarts = np.nonzero(edges == 1)
+            runEnds = np.nonzero(edges == -1)[1]
+            # Join runs of the same row whose windows overlap
+            merged = []
+            for row, runStart, runEnd in zip(runRows, runStarts, runEnds):
+                if (len(merged) > 0) and (merged[-1][0] == row) and (runStart < merged[-1][2] + stepsPerWindow - 1):
+                    merged[-1][2] = runEnd
+                else:
+                    merged.append([row, runStart, runEnd])
+            for row, runStart, runEnd in merged:
+                bursts.append((windowStarts[runStart], windowStarts[runEnd - 1] + windowSize,
+                               row // numCores if isCore else row, row % numCores if isCore else -1,
+                               np.max(rates[row, runStart:runEnd])))
+
+        bursts = np.array(bursts, dtype = [('start', np.float64), ('stop', np.float64), ('chip_id', np.int8),
+                                           ('core_id', np.int8), ('peakRate', np.float64)])
+        return np.sort(bursts, order = 'start')
+
+### ===========================================================================
+    def remove_bursts(self, bursts, decimate = None):
+        """Return a EventsSet without the events of the intervals found by detect_bursts
+
+Parameters:
+    bursts (structured array): Intervals returned by detect_bursts
+    decimate (int, optional): If specified, one event every decimate is kept in the intervals, instead of removing all of them
+
+Returns:
+    obj EventsSet: A set without the events of the flagged cores (or chips) in the flagged intervals
+"""
+
+        ts = np.asarray(self.ts)
+        keep = np.ones(len(ts), dtype = bool)
+        for burst in bursts:
+            init, end = np.searchsorted(ts, [burst['start'], burst['stop']])
+            inBurst = self.chip_id[init:end] == burst['chip_id']
+            if burst['core_id'] >= 0:
+                inBurst &= self.core_id[init:end] == burst['core_id']
+            indexes = init + np.flatnonzero(inBurst)
+            if decimate is not None:
+                indexes = np.delete(indexes, np.s_[::decimate])
+            keep[indexes] = False
+
+        return EventsSet(self.ts[keep], self.chip_id[keep], self.core_id[keep], self.neuron_id[keep])
 
 ### ===========================================================================
     def normalize(self):
@@ -456,4 +1072,104 @@ Returns:
 Note:
     The time of the first event is set to 0. The subsequent are changed accordingly
 """
-        return EventsSet(self.ts - self.ts[0], self.chip_id, self.core_id, self.neuron_id)
\ No newline at end of file
+        return EventsSet(self.ts - self.ts[0], self.chip_id, self.core_id, self.neuron_id)
+### ===========================================================================
+    @staticmethod
+    def merge(*eventsSets, sourceId = False):
+        """Merge several time-ordered EventsSet in a single time-ordered EventsSet
+
+Parameters:
+    *eventsSets (list of obj EventsSet): Sets that must be merged, each one already ordered in time
+    sourceId (bool, optional): If True, return also the index of the set every event comes from
+
+Returns:
+    obj EventsSet: A set containing the events of all the input sets, ordered in time
+
+    If sourceId is True a tuple is returned instead:
+
+        - **mergedSet** (*obj EventsSet*): A set containing the events of all the input sets
+        - **source** (*array, uint*): For every event, position of its set in eventsSets
+
+Note:
+    Every input set must be already ordered in time (recordings and filtered sets are). Events are concatenated
+    and ordered with a single stable sort, that takes advantage of the already ordered runs (it costs about
+    n * log(k) for k sets, and less than a generic sort of n events in any case).
+
+    Events with the same time keep the order of the sets in eventsSets. The dtype of the columns is
+    kept when all the sets share it (compact dtypes are not promoted).
+
+Examples:
+    - Merge two recordings and know from which one every event comes::
+
+        set1 = import_events("recording1.aedat")
+        set2 = import_events("recording2.aedat")
+        mergedSet, source = EventsSet.merge(set1, set2, sourceId = True)
+"""
+
+        if len(eventsSets) == 0:
+            errorString = "Error while merging events sets, no set specified"
+            raise NameError(errorString)
+
+        for setIdx, eventsSet in enumerate(eventsSets):
+            ts = np.asarray(eventsSet.ts)
+            if np.any(ts[1:] < ts[:-1]):
+                errorString = "Error while merging events sets, set {} is not ordered in time".format(setIdx)
+                raise NameError(errorString)
+
+        # Stable sort keeps the order of the sets for events with the same time
+        order = np.argsort(np.concatenate([np.asarray(s.ts) for s in eventsSets]), kind = 'stable')
+
+        mergedSet = EventsSet(np.concatenate([np.asarray(s.ts) for s in eventsSets])[order],
+                              np.concatenate([np.asarray(s.chip_id) for s in eventsSets])[order],
+                              np.concatenate([np.asarray(s.core_id) for s in eventsSets])[order],
+                              np.concatenate([np.asarray(s.neuron_id) for s in eventsSets])[order])
+
+        if sourceId:
+            lengths = [len(s.ts) for s in eventsSets]
+            source = np.repeat(np.arange(len(eventsSets), dtype = np.min_scalar_type(len(eventsSets) - 1)), lengths)[order]
+            return mergedSet, source
+        else:
+            return mergedSet
+
+### ===========================================================================
+def _bin_counts(ts, chip_id, core_id, neuron_id, timeBins, totNeurons, rowsTable = None, out = None):
+    """Count the events of every absolute neuron in every [timeBins[i], timeBins[i + 1]) interval
+
+Events of neurons with absolute index higher than totNeurons and events outside the bins are ignored.
+If rowsTable is specified, events are counted in row rowsTable[absolute neuron] (negative rows are ignored).
+If out is specified, only the non empty cells are added to the contiguous (totNeurons, bins) matrix out, that is returned
+"""
+
+    numBins = len(timeBins) - 1
+    absoluteNeurons = (np.asarray(chip_id, dtype = np.int64) * 1024) + (np.asarray(core_id, dtype = np.int64) * 256) + neuron_id
+    if rowsTable is not None:
+        absoluteNeurons = _lookup(rowsTable, absoluteNeurons)
+    binIndexes = np.searchsorted(timeBins, ts, side = 'right') - 1
+
+    valid = (binIndexes >= 0) & (binIndexes < numBins) & (absoluteNeurons >= 0) & (absoluteNeurons < totNeurons)
+    if out is not None:
+        cells, counts = np.unique(absoluteNeurons[valid] * numBins + binIndexes[valid], return_counts = True)
+        out.reshape(-1)[cells] += counts
+        return out
+    counts = np.bincount(absoluteNeurons[valid] * numBins + binIndexes[valid], minlength = totNeurons * numBins)
+
+    return counts.reshape((totNeurons, numBins))
+
+### ===========================================================================
+def _lookup(table, absoluteNeurons):
+    """Return table[absoluteNeurons], with -1 for the neurons outside the table
+"""
+
+    inside = (absoluteNeurons >= 0) & (absoluteNeurons < len(table))
+    values = np.full(len(absoluteNeurons), -1, dtype = np.int64)
+    values[inside] = table[absoluteNeurons[inside]]
+    return values
+
+### ===========================================================================
+def _neurons_list(neurons):
+    """Return a list of (chip id, core id, neuron id) tuples from a single tuple or a list of them
+"""
+
+    if np.ndim(neurons) == 1:
+        return [tuple(neurons)]
+    return [tuple(neuron) for neuron in neurons]
@@ -1,6 +1,8 @@
 """Contains a class that represent an input event to DYNAP-se
 """
 
+import numpy as np
+
 class InputEvent:
     """Class that represent an input event in DYNAP-se
     """
@@ -61,10 +63,7 @@ Note:
                                       |-----| coreDest
 """
         
-        self.address = (self.chipDest << 14) & 0xffff |\
-                       (self.neuronAddress << 6) & 0xffff |\
-                       self.coreDest & 0xf |\
-                       (self.virtualSourceCoreId << 4) & 0x30
+        self.address = int(encode_addresses(self.virtualSourceCoreId, self.neuronAddress, self.coreDest, self.chipDest))
     
 ### ===========================================================================
     def decode_address_event(self):
@@ -83,6 +82,56 @@ Note:
                                 |-----| coreDest
 """
         
-        self.virtualSourceCoreId = (self.address >> 4) & 0x3
-        self.coreDest = self.address & 0xf
-        self.neuronAddress = (self.address >> 6) & 0xff
\ No newline at end of file
+        virtualSourceCoreId, neuronAddress, coreDest, chipDest = decode_addresses(self.address)
+        self.virtualSourceCoreId = int(virtualSourceCoreId)
+        self.coreDest = int(coreDest)
+        self.neuronAddress = int(neuronAddress)
+
+### ===========================================================================
+def encode_addresses(virtualSourceCoreId, neuronAddress, coreDest, chipDest = 0):
+    """Create the addresses of many events in the spike generator
+
+Parameters:
+    virtualSourceCoreId (array, int): id of the core where is located the virtual neuron
+    neuronAddress (array, int): id of virtual source neuron
+    coreDest (array, int, hot coded): id of the destination cores where the spike is delivered
+    chipDest (array, int, optional): id of the destination chip
+
+Returns:
+    array, uint16: Encoded addresses. Scalar parameters are broadcasted to the length of the others
+
+Note:
+    Bit layout is the same of InputEvent.create_address_event
+"""
+
+    virtualSourceCoreId = np.asarray(virtualSourceCoreId, dtype = np.int64)
+    neuronAddress = np.asarray(neuronAddress, dtype = np.int64)
+    coreDest = np.asarray(coreDest, dtype = np.int64)
+    chipDest = np.asarray(chipDest, dtype = np.int64)
+
+    addresses = (chipDest << 14) & 0xffff |\
+                (neuronAddress << 6) & 0xffff |\
+                coreDest & 0xf |\
+                (virtualSourceCoreId << 4) & 0x30
+
+    return addresses.astype(np.uint16)
+
+### ===========================================================================
+def decode_addresses(addresses):
+    """Decode the characteristics of many events starting from their addresses
+
+Parameters:
+    addresses (array, int): Encoded addresses
+
+Returns:
+    (tuple): tuple containing:
+
+        - **virtualSourceCoreId** (*array, int*): id of the core where is located the virtual neuron
+        - **neuronAddress** (*array, int*): id of virtual source neuron
+        - **coreDest** (*array, int*): id of the destination cores where the spike is delivered
+        - **chipDest** (*array, int*): id of the destination chip
+"""
+
+    addresses = np.asarray(addresses, dtype = np.int64)
+
+    return (addresses >> 4) & 0x3, (addresses >> 6) & 0xff, addresses & 0xf, (addresses >> 14) & 0x3
\ No newline at end of file
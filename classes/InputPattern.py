@@ -4,7 +4,7 @@
 import numpy as np
 import matplotlib.pyplot as plt
 import warnings
-from DYNAPSETools.classes.InputEvent import InputEvent
+from DYNAPSETools.classes.InputEvent import InputEvent, encode_addresses, decode_addresses
 
 class InputPattern:
     """Class that represent a pattern of inputs to DYNAP-se
@@ -48,14 +48,229 @@ Note:
         self.isiRatio = self.isiBase / self.isiForUs
         self.maxDelay = 2**16-1 # In ISI base
         
-        # Generate (address, time) event arrays
-        self.eventList = np.array([])
+        # Generate (address, time) event arrays. They are growable columns: only the first
+        # numEvents positions are valid, capacity is doubled when full
+        self._numEvents = 0
+        self._addresses = np.zeros(16, dtype = np.uint16)
+        self._delays = np.zeros(16, dtype = np.int64)
         self.tSig = np.array([])
         self.ySig = np.array([])
         
         # Create dummyNeuron instance
         self.dummyNeuron = dummyNeuron
+
+        # Cumulative delays and address index, computed when needed and invalidated when events are added
+        self._cumulativeDelays = None
+        self._addressIndex = None
+
+    @classmethod
+    def from_spike_trains(cls, spikeTrains, name = "SpikeTrains", isiBase = 90.0, dummyNeuron = None, duration = None):
+        """Return a new InputPattern object merging the spike trains of many virtual neurons
+
+Parameters:
+    spikeTrains (dict): For every encoded virtual neuron address (see encode_addresses), the array of absolute spike times [s]
+    name (string, optional): Name of the pattern (useful for debug)
+    isiBase (int, optional): Time base for time event generation
+    dummyNeuron (tuple, optional): (virtualSourceCoreId, neuronAddress) of the dummy neuron
+    duration (float, [s], optional): Duration of the pattern. If specified with a dummy neuron, a dummy event is added at this time
+
+Returns:
+    obj InputPattern: Pattern containing the events of all the spike trains, ordered in time
+
+Note:
+    Spike trains are concatenated and sorted with a single stable argsort (spikes at the same time keep the order of
+    the dictionary). Absolute times are quantized to isiBase ticks and delays are their differences, then delays bigger
+    than maxDelay are splitted with dummy neuron events, as in the other generators.
+
+Examples:
+    - Create a pattern from the spike times of two virtual neurons, routed to all physical cores::
+
+        spikeTrains = {encode_addresses(0, 1, 15): [0.1, 0.2, 0.35],
+                       encode_addresses(0, 2, 15): [0.15, 0.2]}
+        pattern = InputPattern.from_spike_trains(spikeTrains, name = "pattern", isiBase = 90, dummyNeuron = (3, 255))
+"""
+
+        pattern = cls(name = name, isiBase = isiBase, dummyNeuron = dummyNeuron)
+
+        addresses = [np.full(len(times), address, dtype = np.uint16) for address, times in spikeTrains.items()]
+        absTimes = [np.asarray(times, dtype = np.float64) for times in spikeTrains.values()]
+        if len(absTimes) != 0:
+            lastTick = pattern._insert_spike_times(np.concatenate(addresses), np.concatenate(absTimes))
+        else:
+            lastTick = 0
+
+        if duration is not None:
+            pattern._fill_to_time(lastTick, duration)
+
+        return pattern
+
+    def __len__(self):
+        """Return the number of events of the pattern
+"""
+        return self._numEvents
+
+    @property
+    def addresses(self):
+        """array, uint16: Encoded address of every event of the pattern
+"""
+        return self._addresses[:self._numEvents]
+
+    @property
+    def delays(self):
+        """array, int: Delay of every event from the previous one, expressed as multiple of isiBase
+"""
+        return self._delays[:self._numEvents]
+
+    @property
+    def absTimes(self):
+        """array, float: Absolute time [us] of every event of the pattern, from the start of the pattern
+"""
+        return self._cumulative_delays() * self.isiRatio
+
+    @property
+    def eventList(self):
+        """array of obj InputEvent: Events of the pattern
+
+Note:
+    Events are stored in the addresses and delays arrays. eventList creates a new InputEvent object for every event,
+    so it is slow for big patterns and modifying its events has no effect on the pattern. Assigning a list of InputEvent
+    to eventList replaces the events of the pattern.
+"""
+        return np.array([InputEvent(address = address, time = delay) for address, delay in zip(self.addresses, self.delays)])
+
+    @eventList.setter
+    def eventList(self, events):
+        self._numEvents = 0
+        self._append_events([event.address for event in events], [event.time for event in events])
+
+### ===========================================================================
+    def _append_events(self, addresses, delays):
+        """Append events to the address and delay columns, growing them if needed
+"""
+
+        addresses = np.asarray(addresses)
+        delays = np.asarray(delays)
+        numEvents = self._numEvents + len(addresses)
+
+        # Addresses are stored as uint16, values outside the range would wrap
+        outside = np.flatnonzero((addresses < 0) | (addresses > 2**16-1))
+        if len(outside) != 0:
+            errorString = "Error while adding events to pattern {}. Event at position {} has address {} outside the range [0, 65535]".format(
+                self.name, outside[0], addresses[outside[0]])
+            raise NameError(errorString)
+
+        if numEvents > len(self._addresses):
+            capacity = max(numEvents, 2 * len(self._addresses))
+            self._addresses = np.concatenate((self._addresses[:self._numEvents], np.zeros(capacity - self._numEvents, dtype = np.uint16)))
+            self._delays = np.concatenate((self._delays[:self._numEvents], np.zeros(capacity - self._numEvents, dtype = np.int64)))
+
+        self._addresses[self._numEvents:numEvents] = addresses
+        self._delays[self._numEvents:numEvents] = delays
+        self._numEvents = numEvents
+
+        self._cumulativeDelays = None
+        self._addressIndex = None
+
+### ===========================================================================
+    def _cumulative_delays(self):
+        """Return the cached cumulative sum of the delays (absolute times in isiBase units)
+"""
+
+        if self._cumulativeDelays is None:
+            self._cumulativeDelays = np.cumsum(self.delays)
+        return self._cumulativeDelays
+
+### ===========================================================================
+    def _address_index(self):
+        """Return the unique addresses of the pattern, the event indexes sorted by address and the boundaries of every address in them
+"""
+
+        if self._addressIndex is None:
+            order = np.argsort(self.addresses, kind = 'stable')
+            uniqueAddresses, starts = np.unique(self.addresses[order], return_index = True)
+            self._addressIndex = (uniqueAddresses, order, np.append(starts, len(order)))
+        return self._addressIndex
+
+### ===========================================================================
+    def address_times(self, address):
+        """Return the absolute times of the events of a virtual neuron
+
+Parameters:
+    address (int): Encoded address of the virtual neuron
+
+Returns:
+    array, float: Absolute times [us] of the events with this address, from the start of the pattern
+"""
+
+        uniqueAddresses, order, bounds = self._address_index()
+        idx = np.searchsorted(uniqueAddresses, address)
+        if (idx == len(uniqueAddresses)) or (uniqueAddresses[idx] != address):
+            return np.zeros(0)
+        return self._cumulative_delays()[order[bounds[idx]:bounds[idx + 1]]] * self.isiRatio
+
+### ===========================================================================
+    def _set_signal(self, t, y, initDelay):
+        """Store the signal of the pattern, with times normalized in [us] and shifted of initDelay, and return its times
+"""
+
+        t = t - t[0] # Time normalization
+        t = t*1e6 # Transform in us scale\
         
+        if initDelay != None:
+            t = t + initDelay * 1e6
+            
+        self.tSig = t
+        self.ySig = y
+
+        return t
+
+### ===========================================================================
+    def _insert_events(self, addresses, delays):
+        """Append events, preceding the ones with delay bigger than maxDelay with dummy neuron events (if dummy neuron is specified)
+"""
+
+        addresses = np.asarray(addresses)
+        delays = np.asarray(delays)
+
+        # Every delay d > maxDelay is splitted in ceil(d / maxDelay) - 1 dummy events with maxDelay, plus the remainder
+        if (self.dummyNeuron is not None) & (len(delays) != 0):
+            numDummies = np.maximum((delays - 1) // self.maxDelay, 0).astype(np.int64)
+            if np.any(numDummies):
+                positions = np.cumsum(numDummies + 1) - 1
+                dummyAddress = encode_addresses(self.dummyNeuron[0], self.dummyNeuron[1], coreDest = 0, chipDest = 0)
+                splittedAddresses = np.full(positions[-1] + 1, dummyAddress, dtype = np.uint16)
+                splittedDelays = np.full(positions[-1] + 1, self.maxDelay, dtype = np.int64)
+                splittedAddresses[positions] = addresses
+                splittedDelays[positions] = delays - numDummies * self.maxDelay
+                addresses, delays = splittedAddresses, splittedDelays
+
+        self._append_events(addresses, delays)
+
+### ===========================================================================
+    def _insert_spike_times(self, addresses, absTimes):
+        """Append events given their absolute times [s] (from the end of the pattern), in any order
+
+Note:
+    Events are sorted in time and absolute times are quantized to isiBase ticks before evaluating the delays, so
+    quantization errors do not accumulate
+"""
+
+        order = np.argsort(absTimes, kind = 'stable')
+        ticks = np.round(np.asarray(absTimes)[order] * 1e+6 / self.isiRatio).astype(np.int64) #/*In ISI units*/
+        self._insert_events(np.asarray(addresses)[order], np.diff(ticks, prepend = 0))
+
+        return ticks[-1] if len(ticks) != 0 else 0
+
+### ===========================================================================
+    def _fill_to_time(self, lastTick, endTime):
+        """Append a dummy neuron event at endTime [s] (from the start of the last generated events), if dummy neuron is specified
+"""
+
+        endTick = int(np.round(endTime * 1e+6 / self.isiRatio))
+        if (self.dummyNeuron is not None) & (endTick > lastTick):
+            self._insert_events([encode_addresses(self.dummyNeuron[0], self.dummyNeuron[1], coreDest = 0, chipDest = 0)],
+                                [endTick - lastTick])
+
 ### ===========================================================================
     def single_event(self, virtualSourceCoreId, neuronAddress, coreDest, fireFreq = None, firePeriod = None, chipDest = 0):
         """Create a single address and time step for a specified neuron and a certain interspike interval
@@ -100,16 +315,8 @@ Examples:
             errorString = "Error while creating event {}, specify or fire frequency or fire period: ".format(self.name)
             raise NameError(errorString)
             
-        # If dummy neuron specified, insert them with maximum delay until the time is not < max allowed
-        if(time > self.maxDelay):
-            if self.dummyNeuron is not None:
-                while(time > self.maxDelay):
-                    self.eventList = np.append(self.eventList, InputEvent(self.dummyNeuron[0], self.dummyNeuron[1],
-                                                                          coreDest = 0, time = self.maxDelay, chipDest = 0))
-                    time -= self.maxDelay
-            
-        # Create event
-        self.eventList = np.append(self.eventList, InputEvent(virtualSourceCoreId, neuronAddress, coreDest, time = time, chipDest = chipDest))
+        # Create event. If dummy neuron specified, it is inserted with maximum delay until the time is not < max allowed
+        self._insert_events([encode_addresses(virtualSourceCoreId, neuronAddress, coreDest, chipDest)], [time])
 
 ### ===========================================================================
     def multiple_events(self, virtualSourceCoreId, neuronAddress, coreDest, absTimes = None, fireFreq = None, firePeriod = None, chipDest = 0):
@@ -155,35 +362,24 @@ Examples:
                                     firePeriod = [20e-3, 20e-3, 20e-3])
 """
         
-        # Find which type of event series must be generated
-        freq = False
-        period = False
-        
         # Extract from absolute times the firePeriods
         if absTimes is not None:
-            firePeriod = []
-            diff = np.diff(absTimes)
-            firePeriod.append(absTimes[0])
-            firePeriod.extend(diff)
-            
+            absTimes = np.asarray(absTimes, dtype = np.float64)
+            firePeriod = np.concatenate((absTimes[:1], np.diff(absTimes)))
+
+        # Evaluate the delays of all the events (in ISI units)
         if fireFreq is not None:
-            freq = True
+            times = np.round((1.0 / np.asarray(fireFreq, dtype = np.float64)) * 1e+6 / self.isiRatio)
         elif firePeriod is not None:
-            period = True
+            times = np.round(np.asarray(firePeriod, dtype = np.float64) * 1e+6 / self.isiRatio)
         else:
             errorString = "Error while creating event, specify or fire frequency or fire period: "
             raise NameError(errorString)
-        
-        # Adapt chip_id vector to the length of the other parameters...if remains 0 can create problems when not specifying it
-        if np.size(chipDest) == 1:
-            chipDest = [chipDest] * len(coreDest)
-
-        # Scan the fireFreq or firePeriod vector and create all events
-        for idx, addr in enumerate(neuronAddress):
-            if freq:
-                self.single_event(virtualSourceCoreId[idx], addr, coreDest[idx], fireFreq = fireFreq[idx], chipDest = chipDest[idx])
-            else:
-                self.single_event(virtualSourceCoreId[idx], addr, coreDest[idx],  firePeriod = firePeriod[idx], chipDest = chipDest[idx])
+
+        # Create all events at once. chipDest can be a single value, used for all the events
+        numEvents = len(neuronAddress)
+        addresses = encode_addresses(virtualSourceCoreId, neuronAddress, coreDest, chipDest)
+        self._insert_events(np.broadcast_to(addresses, (numEvents,)), times[:numEvents])
 
 ### ===========================================================================
     def constant_freq(self, virtualSourceCoreId, neuronAddress, coreDest, fireFreq, initDelay, duration, chipDest = 0):
@@ -219,13 +415,15 @@ Examples:
         
         freqPhase = (1.0 / duration) # in Hz
         
-        # Insert the first initial spike after an initial delay
-        self.single_event(virtualSourceCoreId, neuronAddress, coreDest, firePeriod = initDelay, chipDest = chipDest)
-        
         # Repeat (address, time) to occupy the whole duration of the frequency phase duration*/ 
-        num_events = int(np.round(fireFreq / freqPhase))       
-        for event in range(num_events):
-            self.single_event(virtualSourceCoreId, neuronAddress, coreDest, fireFreq = fireFreq, chipDest = chipDest)
+        num_events = int(np.round(fireFreq / freqPhase))
+
+        # The first initial spike is inserted after an initial delay
+        times = np.full(num_events + 1, np.round((1.0 / fireFreq) * 1e+6 / self.isiRatio))
+        times[0] = np.round(initDelay * 1e+6 / self.isiRatio)
+
+        address = encode_addresses(virtualSourceCoreId, neuronAddress, coreDest, chipDest)
+        self._insert_events(np.full(num_events + 1, address, dtype = np.uint16), times)
 
 ### ===========================================================================
     def linear_freq_modulation(self, virtualSourceCoreId, neuronAddress, coreDest, freqStart, freqStop, freqSteps, freqPhaseDuration, initDelay, chipDest = 0):
@@ -271,15 +469,15 @@ Examples:
         freqPhase = (1.0 / freqPhaseDuration) # in Hz
         freqs = np.linspace(freqStart, freqStop, freqSteps) # in Hz
         
-        # Insert the first initial spike after an initial delay
-        self.single_event(virtualSourceCoreId, neuronAddress, coreDest, firePeriod = initDelay, chipDest = chipDest)
-        
-        # Step on all frequencies and create (address, time) events list
-        for freq in freqs:
-            # Repeat (address, time) to occupy the whole duration of the frequency phase duration*/ 
-            num_events_this_freq = int(np.round(freq / freqPhase))
-            for event in range(num_events_this_freq):
-                self.single_event(virtualSourceCoreId, neuronAddress, coreDest, fireFreq = freq, chipDest = chipDest)
+        # Repeat (address, time) to occupy the whole duration of every frequency phase duration*/ 
+        num_events_per_freq = np.round(freqs / freqPhase).astype(np.int64)
+
+        # The first initial spike is inserted after an initial delay
+        times = np.concatenate(([np.round(initDelay * 1e+6 / self.isiRatio)],
+                                np.repeat(np.round((1.0 / freqs) * 1e+6 / self.isiRatio), num_events_per_freq)))
+
+        address = encode_addresses(virtualSourceCoreId, neuronAddress, coreDest, chipDest)
+        self._insert_events(np.full(len(times), address, dtype = np.uint16), times)
 
 ### ===========================================================================
     def threshold_encoder(self, virtualSourceCoreId, neuronAddressUpCH, neuronAddressDwCH, coreDest, threshold, t, y, noiseVar, initDelay, chipDest = 0):
@@ -342,77 +540,27 @@ Examples:
 """
         
         # Initialization
-        t = t - t[0] # Time normalization
-        t = t*1e6 # Transform in us scale\
-        
-        if initDelay != None:
-            t = t + initDelay * 1e6
-            
-        self.tSig = t
-        self.ySig = y
-        
-        spikeTimes = []
-        spikeAddresses = []
-                
-        # Insert the first spike after an initial delay*/
-        if initDelay != None:
-            spikeTimes.append(initDelay)
-            if y[1] >= y[0]: # Positive slope
-                spikeAddresses.append(neuronAddressUpCH)
-            else: # Negative slope
-                spikeAddresses.append(neuronAddressDwCH)
-
-        # Scan the whole sinewave and create spikes
-        lastSpikeIndex = 0
-        for idy, valy in enumerate(y):
-            if (valy - y[lastSpikeIndex]) >= threshold: # If signal goes up of a quantity higher than threshold
-                # Evaluate interspike interval
-                time = t[idy] / 1e6
-                # Apply noise
-                noise = np.random.uniform(low = -noiseVar, high = noiseVar)
-                time = time + noise
-                ## Delete noise if goes out from signal boundaries
-                if(time < 0 or time > self.tSig[-1]):
-                    time = time - noise
-                # Create event
-                spikeTimes.append(time)
-                spikeAddresses.append(neuronAddressUpCH)
-                lastSpikeIndex = idy
-                    
-            elif (valy - y[lastSpikeIndex]) <= -(threshold): # If signal goes dows of a quantity higher than threshold
-                # Evaluate interspike interval
-                time = t[idy] / 1e6
-                # Apply noise
-                noise = np.random.uniform(low = -noiseVar, high = noiseVar)
-                time = time + noise
-                ## Delete noise if goes out from signal boundaries
-                if(time < 0 or time > self.tSig[-1]):
-                    time = time - noise
-                # Create event
-                spikeTimes.append(time)
-                spikeAddresses.append(neuronAddressDwCH)
-                lastSpikeIndex = idy
+        t = self._set_signal(t, y, initDelay)
         
-        # Reorder the times and addresses if noiseVar is different from 0 because is not guaranteed that the time list 
-        # is ordered. It would fail writing the output file
-        if(noiseVar != 0):
-            sortedPair = sorted(zip(spikeTimes, spikeAddresses))
-            spikeTimes = [x for x,_ in sortedPair]
-            spikeAddresses = [x for _,x in sortedPair]
+        # Find the spikes of the signal and apply noise (drawn for all spikes at once)
+        indexes, up = _threshold_crossings(y, threshold)
+        noise = np.random.uniform(low = -noiseVar, high = noiseVar, size = len(indexes))
+        spikeTimes, spikeAddresses = _threshold_spikes(t, y, indexes, up, noise, noiseVar, initDelay,
+                                                       neuronAddressUpCH, neuronAddressDwCH)
         
-        virtualSourceCoreIds = [virtualSourceCoreId]*len(spikeTimes)
-        coreDests = [coreDest]*len(spikeTimes)
-        chipDests = [chipDest]*len(spikeTimes)
+        virtualSourceCoreIds = np.full(len(spikeTimes), virtualSourceCoreId)
+        coreDests = np.full(len(spikeTimes), coreDest)
+        chipDests = np.full(len(spikeTimes), chipDest)
         
         # If last spike is before end of signal, try to add a dummy one to fill the gap,
         # otherwise raise a warning
         if(spikeTimes[-1] < self.tSig[-1]):
             if self.dummyNeuron is not None:
-                spikeTimes.append(self.tSig[-1] / 1e6)
-                virtualSourceCoreIds.append(self.dummyNeuron[0])
-                spikeAddresses.append(self.dummyNeuron[1])
-                coreDests.append(0)
-                chipDests.append(0)
+                spikeTimes = np.append(spikeTimes, self.tSig[-1] / 1e6)
+                virtualSourceCoreIds = np.append(virtualSourceCoreIds, self.dummyNeuron[0])
+                spikeAddresses = np.append(spikeAddresses, self.dummyNeuron[1])
+                coreDests = np.append(coreDests, 0)
+                chipDests = np.append(chipDests, 0)
             else:
                 warnString = "Warning while converting events for pattern {}: ".format(self.name)
                 warnString += "Last spike is not matched with signal lenght: add a dummy neuron for\
@@ -444,6 +592,105 @@ Examples:
         #print('min Dw channel frequency: %.5f Hz' % np.round(minDwChFrequency))
         #print('=======================================')
         
+### ===========================================================================
+    def poisson_events(self, virtualSourceCoreId, neuronAddress, coreDest, fireFreq, duration, initDelay = 0, chipDest = 0, rng = None):
+        """Create Poisson spike trains with constant firing frequency for many virtual neurons
+
+Parameters:
+    virtualSourceCoreId (array, int): Represent the ID of the virtual core where is located the virtual neuron (from 0 to 3)
+    neuronAddress (array, int): Represent the address of the virtual neurons that will generate the events
+    coreDest (array, int, 4 bit hot coded): Represent the destination cores in which the spikes will be routed
+    fireFreq (array, float, [Hz]): Mean firing frequency of every neuron (or a single one for all neurons)
+    duration (float, [s]): Duration of the event pattern
+    initDelay (float, [s], optional): Delay of the start of the spike trains
+    chipDest (array, int, optional): Destination chip
+    rng (np.random.Generator or int, optional): Random generator, or seed of a new one
+
+Note:
+    The trains of all neurons are merged in a single time ordered sequence of events. Absolute spike times are quantized
+    to isiBase ticks, so events closer than isiBase resolution get a 0 delay.
+
+    If a dummy neuron is specified, it is used for delays bigger than maxDelay and a dummy event is added at the end
+    of the duration, so that patterns appended after this one start after <initDelay + duration>.
+
+Examples:
+    Initialize the pattern istantiating the object::
+
+        pattern = InputPattern(name = "pattern", isiBase = 90, dummyNeuron = (3, 255))
+
+    - 100 virtual neurons of virtual core 0 firing at 20 Hz for 2 s, routed to all physical cores::
+
+        pattern.poisson_events(virtualSourceCoreId = 0, neuronAddress = np.arange(100), coreDest = 15,
+                               fireFreq = 20, duration = 2, rng = 42)
+"""
+
+        rng = np.random.default_rng(rng)
+        addresses = np.atleast_1d(encode_addresses(virtualSourceCoreId, neuronAddress, coreDest, chipDest))
+        fireFreq = np.broadcast_to(np.asarray(fireFreq, dtype = np.float64), addresses.shape)
+
+        # Number of spikes of every neuron, then uniform spike times in the duration
+        numSpikes = rng.poisson(fireFreq * duration)
+        neurons = np.repeat(np.arange(len(addresses)), numSpikes)
+        spikeTimes = rng.uniform(0, duration, size = len(neurons))
+
+        lastTick = self._insert_spike_times(addresses[neurons], initDelay + spikeTimes)
+        self._fill_to_time(lastTick, initDelay + duration)
+
+### ===========================================================================
+    def inhomogeneous_poisson_events(self, virtualSourceCoreId, neuronAddress, coreDest, t, fireFreq, initDelay = 0, chipDest = 0, rng = None):
+        """Create Poisson spike trains with time varying firing frequency for many virtual neurons
+
+Parameters:
+    virtualSourceCoreId (array, int): Represent the ID of the virtual core where is located the virtual neuron (from 0 to 3)
+    neuronAddress (array, int): Represent the address of the virtual neurons that will generate the events
+    coreDest (array, int, 4 bit hot coded): Represent the destination cores in which the spikes will be routed
+    t (array, float, [s]): Time vector of the firing frequencies
+    fireFreq (2D array, float, [Hz]): Firing frequency of every neuron (rows) at every time of t. A 1D array is used for all neurons
+    initDelay (float, [s], optional): Delay of the start of the spike trains
+    chipDest (array, int, optional): Destination chip
+    rng (np.random.Generator or int, optional): Random generator, or seed of a new one
+
+Note:
+    Spikes are generated by thinning: a Poisson train with the maximum frequency of every neuron is generated, then
+    every spike is kept with probability fireFreq(t) / max(fireFreq), where fireFreq(t) is linearly interpolated.
+
+    As in threshold_encoder, time vector is normalized (t - t[0]), and the pattern lasts <initDelay + t[-1] - t[0]>.
+    Merging, quantization and dummy neuron are the same of poisson_events.
+
+Examples:
+    Initialize the pattern istantiating the object::
+
+        pattern = InputPattern(name = "pattern", isiBase = 90, dummyNeuron = (3, 255))
+
+    - 50 virtual neurons whose frequency is modulated by a 1 Hz sinewave, between 0 and 40 Hz::
+
+        t = np.linspace(0, 2, 1000)
+        pattern.inhomogeneous_poisson_events(virtualSourceCoreId = 0, neuronAddress = np.arange(50), coreDest = 15,
+                                             t = t, fireFreq = 20 + 20 * np.sin(2 * np.pi * t), rng = 42)
+"""
+
+        rng = np.random.default_rng(rng)
+        addresses = np.atleast_1d(encode_addresses(virtualSourceCoreId, neuronAddress, coreDest, chipDest))
+        t = np.asarray(t, dtype = np.float64)
+        t = t - t[0]
+        fireFreq = np.broadcast_to(np.asarray(fireFreq, dtype = np.float64), (len(addresses), len(t)))
+        maxFreq = fireFreq.max(axis = 1)
+        duration = t[-1]
+
+        # Candidate spikes with the maximum frequency of every neuron
+        numSpikes = rng.poisson(maxFreq * duration)
+        neurons = np.repeat(np.arange(len(addresses)), numSpikes)
+        spikeTimes = rng.uniform(0, duration, size = len(neurons))
+
+        # Thinning, with the frequency linearly interpolated at the candidate times
+        idx = np.clip(np.searchsorted(t, spikeTimes, side = 'right') - 1, 0, len(t) - 2)
+        fraction = (spikeTimes - t[idx]) / (t[idx + 1] - t[idx])
+        freq = fireFreq[neurons, idx] * (1 - fraction) + fireFreq[neurons, idx + 1] * fraction
+        keep = rng.uniform(0, 1, size = len(neurons)) * maxFreq[neurons] < freq
+
+        lastTick = self._insert_spike_times(addresses[neurons[keep]], initDelay + spikeTimes[keep])
+        self._fill_to_time(lastTick, initDelay + duration)
+
 ### ===========================================================================
     def plot_spikes(self, timeShift = 0, fig = None, ax = None, plotSig = False):
         """ Plot the spikes of the current pattern
@@ -472,32 +719,17 @@ Note:
             ax = fig.add_subplot(111)
             
         # Create absolute times
-        absTimes = []
-        for event in self.eventList:
-            try:
-                absTimes.append(absTimes[-1] + event.time * self.isiRatio)
-            except:
-                absTimes.append(event.time * self.isiRatio + timeShift)
-        absTimes = np.array(absTimes)
-
-        # Create vector of addresses
-        addresses = []
-        for event in self.eventList:
-            addresses.append(event.address)
-        addresses = np.array(addresses)
-        
-        # Create set of addresses
-        setAddresses = []
-        for address in addresses:
-            if(address not in setAddresses):
-                setAddresses.append(address)
-        setAddresses = np.array(list(setAddresses))
+        absTimes = self.absTimes + timeShift
+
+        # Group events by address, in order of first appearance
+        uniqueAddresses, order, bounds = self._address_index()
+        firstEvents = order[bounds[:-1]]
         
         # Plot separately
         handles = []
-        for idx, address in enumerate(setAddresses):
-            indexes = np.where(addresses == address)
-            times = absTimes[indexes]
+        for idx, group in enumerate(np.argsort(firstEvents)):
+            address = uniqueAddresses[group]
+            times = absTimes[order[bounds[group]:bounds[group + 1]]]
             arrowDim = 1
 #            handle = ax.quiver(times,
 #                               np.zeros(len(times)),
@@ -507,9 +739,8 @@ Note:
 #                               angles = 'xy', scale_units = 'xy', scale = 1,
 #                               label = self.name)
 #            ax.plot(times, arrowDim * np.ones(len(times)), linestyle  = 'None', color = "C" + str(idx), marker = '^')
-            decodedEvent = InputEvent(address = address, time = 0)
-            label = "Virtual Neuron C{}N{}".format(decodedEvent.virtualSourceCoreId,
-                                           decodedEvent.neuronAddress)
+            virtualSourceCoreId, neuronAddress, _, _ = decode_addresses(address)
+            label = "Virtual Neuron C{}N{}".format(virtualSourceCoreId, neuronAddress)
             handle = ax.vlines(x = times/1e6, ymin = 0, ymax = arrowDim, colors = "C" + str(idx),
                               label = label)
             handles.append(handle)
@@ -544,7 +775,21 @@ Parameters:
     time (int): Delay after which the event is generated. It is expressed as multiple of isiBase
 """
 
-        np.append(self.eventList, InputEvent(address = address, time = time))
+        self._append_events([address], [time])
+
+### ===========================================================================
+    def add_manually_events(self, addresses, times):
+        """Add manually many events starting from their addresses and times
+
+Parameters:
+    addresses (array, int): Encoded addresses of the virtual neurons
+    times (array, int): Delays after which the events are generated. They are expressed as multiple of isiBase
+"""
+
+        if len(addresses) != len(times):
+            errorString = "Error while adding events to pattern {}, addresses and times have different lengths".format(self.name)
+            raise NameError(errorString)
+        self._append_events(addresses, times)
 
 ### ===========================================================================
     def evaluate_duration(self, retSigTime = False):
@@ -554,12 +799,68 @@ Returns:
     float: Duration of the whole pattern
 """
 
-        time = 0
-        for event in self.eventList:
-            time = time + event.time * self.isiRatio
+        time = self._cumulative_delays()[-1] * self.isiRatio if len(self) != 0 else 0.0
         
         if retSigTime:
             if len(self.tSig) != 0:
                 time = self.tSig[-1]
 
-        return time
\ No newline at end of file
+        return time
+
+### ===========================================================================
+def _threshold_crossings(y, threshold, chunkSize = 64):
+    """Return the indexes of the samples where the signal moves more than threshold from the previous spike sample,
+and if each movement is upwards
+
+Note:
+    The scan is sequential (every spike changes the reference sample), but the next spike is searched on chunks of
+    samples at once, doubling the chunk until it is found
+"""
+
+    y = np.asarray(y, dtype = np.float64)
+    indexes = []
+    up = []
+
+    lastSpikeIndex = 0
+    init = 0
+    chunk = chunkSize
+    while init < len(y):
+        delta = y[init:init + chunk] - y[lastSpikeIndex]
+        upChunk = delta >= threshold
+        spikes = upChunk | (delta <= -(threshold))
+        position = np.argmax(spikes)
+        if spikes[position]:
+            indexes.append(init + position)
+            up.append(upChunk[position])
+            lastSpikeIndex = init + position
+            init = lastSpikeIndex + 1
+            chunk = max(chunkSize, 2 * (position + 1))
+        else:
+            init += chunk
+            chunk *= 2
+
+    return np.array(indexes, dtype = np.int64), np.array(up, dtype = bool)
+
+def _threshold_spikes(t, y, indexes, up, noise, noiseVar, initDelay, neuronAddressUpCH, neuronAddressDwCH):
+    """Return spike times [s] and neuron addresses of the threshold encoding of a signal, given its threshold crossings
+"""
+
+    # Apply noise, delete it if goes out from signal boundaries (t is in us)
+    spikeTimes = t[indexes] / 1e6 + noise
+    outside = (spikeTimes < 0) | (spikeTimes > t[-1])
+    spikeTimes[outside] = spikeTimes[outside] - noise[outside]
+    spikeAddresses = np.where(up, neuronAddressUpCH, neuronAddressDwCH)
+
+    # Insert the first spike after an initial delay*/
+    if initDelay != None:
+        spikeTimes = np.concatenate(([initDelay], spikeTimes))
+        spikeAddresses = np.concatenate(([neuronAddressUpCH if y[1] >= y[0] else neuronAddressDwCH], spikeAddresses))
+
+    # Reorder the times and addresses if noiseVar is different from 0 because is not guaranteed that the time list
+    # is ordered. It would fail writing the output file
+    if(noiseVar != 0):
+        order = np.lexsort((spikeAddresses, spikeTimes))
+        spikeTimes = spikeTimes[order]
+        spikeAddresses = spikeAddresses[order]
+
+    return spikeTimes, spikeAddresses
@@ -0,0 +1,291 @@
+"""Contains a class that represent a set of DYNAP-se events stored on disk
+"""
+
+import os
+import numpy as np
+from DYNAPSETools.classes.EventsSet import EventsSet, _bin_counts
+
+class MemmapEventsSet(EventsSet):
+    """A set of DYNAP-se events whose columns are memory mapped files
+    """
+
+    # dtype of the file of every column
+    columnDtypes = {"ts": np.int64,
+                    "chip_id": np.uint8,
+                    "core_id": np.uint8,
+                    "neuron_id": np.uint16}
+
+    # Time subtracted from the ts file when ts is accessed (set by normalize)
+    timeOffset = 0
+
+    def __init__(self, directory, chunkSize = 2**22):
+        """Return a new MemmapEventsSet object
+
+Parameters:
+    directory (string): Folder containing the column files (ts.dat, chip_id.dat, core_id.dat, neuron_id.dat)
+    chunkSize (int, optional): Number of events loaded in memory at the same time
+
+Note:
+    The set behaves as an EventsSet, but ts, chip_id, core_id and neuron_id are np.memmap arrays, so
+    recordings bigger than the available memory can be analyzed. The column files are raw arrays with the
+    dtypes in columnDtypes. Times are stored as integers: sets with non integer ts cannot be written on disk.
+
+    filter_events, slicing, isolate_events_sets and calculate_firing_rate_matrix work chunk by chunk, loading
+    at most chunkSize events at a time:
+
+    - slicing and isolate_events_sets return MemmapEventsSet views on the same files, without copies
+    - filter_events returns an EventsSet in memory, or a new MemmapEventsSet if a directory is specified
+    - calculate_firing_rate_matrix accumulates the spike counts of every chunk (as address_counts, detect_bursts
+      and calculate_smoothed_firing_rate, that count events in bins)
+    - normalize returns a view on the same files that subtracts the first time from ts, or writes a normalized copy
+      if a directory is specified
+
+    Other methods inherited from EventsSet are not chunked: clean, calculate_psth, remove_bursts and merge load all the
+    columns in memory, so use them on sets that fit in memory (for example the experiments taken with slicing).
+
+Examples:
+    - Import a recording to disk and analyze it as a normal EventsSet::
+
+        set = import_events_memmap("recording.aedat", directory = "recordingColumns")
+        filteredSet = set.filter_events(chip_id = 0, core_id = [0, 1], neuron_id = None)
+        timeSteps, neuronsFireRate = set.calculate_firing_rate_matrix(totNeurons = 1024, timeBin = 0.02)
+
+    - Open again the same recording::
+
+        set = MemmapEventsSet("recordingColumns")
+"""
+
+        self.directory = directory
+        self.chunkSize = chunkSize
+
+        columns = []
+        for column, dtype in self.columnDtypes.items():
+            fileName = os.path.join(directory, column + ".dat")
+            try:
+                if os.path.getsize(fileName) == 0:
+                    columns.append(np.zeros(0, dtype = dtype))
+                else:
+                    columns.append(np.memmap(fileName, dtype = dtype, mode = 'r'))
+            except OSError:
+                errorString = "Error while opening events set in {}, cannot open file {}".format(directory, fileName)
+                raise NameError(errorString)
+
+        EventsSet.__init__(self, *columns)
+
+    @classmethod
+    def _from_columns(cls, ts, chip_id, core_id, neuron_id, directory, chunkSize, timeOffset = 0):
+        """Return a MemmapEventsSet on already opened columns (used for views)
+"""
+
+        eventsSet = cls.__new__(cls)
+        eventsSet.directory = directory
+        eventsSet.chunkSize = chunkSize
+        eventsSet.timeOffset = timeOffset
+        EventsSet.__init__(eventsSet, ts, chip_id, core_id, neuron_id)
+        return eventsSet
+
+    @property
+    def ts(self):
+        if self.timeOffset == 0:
+            return self._ts
+        return _OffsetColumn(self._ts, self.timeOffset)
+
+    @ts.setter
+    def ts(self, ts):
+        self._ts = ts
+
+    def __getitem__(self, key):
+        """Return a time filtered MemmapEventsSet object, sharing the files of the current one
+
+Parameters:
+    key (tuple, ints): a tuple containing an init and an end index
+"""
+        init, end = key
+        return MemmapEventsSet._from_columns(self._ts[init:end], self.chip_id[init:end], self.core_id[init:end], self.neuron_id[init:end],
+                                             self.directory, self.chunkSize, self.timeOffset)
+
+    def __len__(self):
+        return len(self._ts)
+
+### ===========================================================================
+    @staticmethod
+    def from_events_set(eventsSet, directory, chunkSize = 2**22):
+        """Write an EventsSet on disk and return the MemmapEventsSet that maps it
+
+Parameters:
+    eventsSet (obj EventsSet): Set that must be written
+    directory (string): Folder where column files are created (it is created if not existing)
+    chunkSize (int, optional): Number of events written at the same time
+
+Returns:
+    obj MemmapEventsSet: the set mapped on the new files
+
+Note:
+    ts is stored as int64: a NameError is raised if eventsSet has non integer times.
+"""
+
+        writer = _ColumnsWriter(directory)
+        for init in range(0, len(eventsSet.ts), chunkSize):
+            writer.append(eventsSet.ts[init:init + chunkSize], eventsSet.chip_id[init:init + chunkSize],
+                          eventsSet.core_id[init:init + chunkSize], eventsSet.neuron_id[init:init + chunkSize])
+        writer.close()
+
+        return MemmapEventsSet(directory, chunkSize = chunkSize)
+
+### ===========================================================================
+    def _chunks(self):
+        """Yield in-memory EventsSet of at most chunkSize events, covering the whole set
+"""
+
+        for init in range(0, len(self._ts), self.chunkSize):
+            end = init + self.chunkSize
+            yield init, EventsSet(np.asarray(self.ts[init:end]), np.asarray(self.chip_id[init:end]),
+                                  np.asarray(self.core_id[init:end]), np.asarray(self.neuron_id[init:end]))
+
+### ===========================================================================
+    def filter_events(self, chip_id, core_id, neuron_id, directory = None):
+        """Return a EventsSet containing only the wanted events
+
+Parameters:
+    chip_id (int): id of the chip you want to take events from
+    core_id (list, int; int): id of the cores you want to take event from
+    neuron_id (2D list, int; list, int; int): id of the neurons you want to take events from
+    directory (string, optional): If specified, filtered events are written in this folder and a MemmapEventsSet is returned
+
+Returns:
+    obj EventsSet: A set containing the events resulting from the filtering
+
+Note:
+    Filters are the same of EventsSet.filter_events, but they are applied one chunk at a time.
+"""
+
+        if directory is not None:
+            writer = _ColumnsWriter(directory)
+        else:
+            filteredChunks = []
+
+        for init, chunk in self._chunks():
+            filteredChunk = chunk.filter_events(chip_id, core_id, neuron_id)
+            if directory is not None:
+                writer.append(filteredChunk.ts, filteredChunk.chip_id, filteredChunk.core_id, filteredChunk.neuron_id)
+            else:
+                filteredChunks.append(filteredChunk)
+
+        if directory is not None:
+            writer.close()
+            return MemmapEventsSet(directory, chunkSize = self.chunkSize)
+        elif len(filteredChunks) == 0:
+            return EventsSet(np.zeros(0, self.ts.dtype), np.zeros(0, self.chip_id.dtype),
+                             np.zeros(0, self.core_id.dtype), np.zeros(0, self.neuron_id.dtype))
+        else:
+            return EventsSet(np.concatenate([c.ts for c in filteredChunks]),
+                             np.concatenate([c.chip_id for c in filteredChunks]),
+                             np.concatenate([c.core_id for c in filteredChunks]),
+                             np.concatenate([c.neuron_id for c in filteredChunks]))
+
+### ===========================================================================
+    def normalize(self, directory = None):
+        """Normalize the time of the current MemmapEventsSet
+
+Parameters:
+    directory (string, optional): If specified, the normalized set is written in this folder
+
+Returns:
+    obj MemmapEventsSet: A new normalized set
+
+Note:
+    The time of the first event is set to 0. Without directory, the normalized set is a view on the same files that
+    subtracts the time of the first event when ts is accessed, so nothing is copied.
+"""
+
+        t0 = self.ts[0]
+        if directory is None:
+            return MemmapEventsSet._from_columns(self._ts, self.chip_id, self.core_id, self.neuron_id,
+                                                 self.directory, self.chunkSize, self.timeOffset + t0)
+
+        writer = _ColumnsWriter(directory)
+        for init, chunk in self._chunks():
+            writer.append(chunk.ts - t0, chunk.chip_id, chunk.core_id, chunk.neuron_id)
+        writer.close()
+
+        return MemmapEventsSet(directory, chunkSize = self.chunkSize)
+
+### ===========================================================================
+    def _count_events_in_bins(self, timeBins, totNeurons, rowsTable = None, out = None):
+        """Return a (totNeurons, bins) matrix with the number of events of every neuron in every time bin
+"""
+
+        if out is not None:
+            for init, chunk in self._chunks():
+                _bin_counts(chunk.ts, chunk.chip_id, chunk.core_id, chunk.neuron_id, timeBins, totNeurons, rowsTable, out)
+            return out
+
+        counts = np.zeros((totNeurons, len(timeBins) - 1), dtype = np.int64)
+        for init, chunk in self._chunks():
+            counts += _bin_counts(chunk.ts, chunk.chip_id, chunk.core_id, chunk.neuron_id, timeBins, totNeurons, rowsTable)
+
+        return counts
+
+### ===========================================================================
+    def _find_marker_events(self, markerTable):
+        """Return the indexes and the markerTable values of the events of neurons with non negative markerTable value
+"""
+
+        indexes = []
+        codes = []
+        for init, chunk in self._chunks():
+            chunkIndexes, chunkCodes = chunk._find_marker_events(markerTable)
+            indexes.append(init + chunkIndexes)
+            codes.append(chunkCodes)
+        if len(indexes) == 0:
+            return np.zeros(0, dtype = np.int64), np.zeros(0, dtype = np.int64)
+        return np.concatenate(indexes), np.concatenate(codes)
+
+### ===========================================================================
+class _OffsetColumn(np.lib.mixins.NDArrayOperatorsMixin):
+    """Memory mapped ts column of a normalized MemmapEventsSet, with the time offset subtracted when values are read
+"""
+
+    def __init__(self, column, offset):
+        self.column = column
+        self.offset = offset
+        self.dtype = column.dtype
+        self.shape = column.shape
+        self.ndim = column.ndim
+
+    def __len__(self):
+        return len(self.column)
+
+    def __getitem__(self, key):
+        return np.asarray(self.column[key]) - self.offset
+
+    def __array__(self, dtype = None, copy = None):
+        values = np.asarray(self.column) - self.offset
+        return values if dtype is None else values.astype(dtype, copy = False)
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        inputs = [np.asarray(value) if isinstance(value, _OffsetColumn) else value for value in inputs]
+        return getattr(ufunc, method)(*inputs, **kwargs)
+
+### ===========================================================================
+class _ColumnsWriter:
+    """Append events to the column files of a MemmapEventsSet
+"""
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok = True)
+        self.files = {column: open(os.path.join(directory, column + ".dat"), 'wb')
+                      for column in MemmapEventsSet.columnDtypes}
+
+    def append(self, ts, chip_id, core_id, neuron_id):
+        ts = np.asarray(ts)
+        if (ts.dtype.kind not in "iu") and np.any(ts != np.round(ts)):
+            self.close()
+            errorString = "Error while writing events set on disk, ts must contain integer times [us]"
+            raise NameError(errorString)
+        for column, values in zip(MemmapEventsSet.columnDtypes, (ts, chip_id, core_id, neuron_id)):
+            np.asarray(values).astype(MemmapEventsSet.columnDtypes[column], copy = False).tofile(self.files[column])
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
@@ -0,0 +1,191 @@
+"""Contains a class that stores on disk the events created by InputPattern generators
+"""
+
+import os
+import hashlib
+import tempfile
+import inspect
+import numpy as np
+
+class PatternCache:
+    """Memoization of InputPattern generator calls, stored on local disk
+    """
+
+    # Version of the cached events, part of every hash. Increase it when a generator changes the events it creates,
+    # so that entries created by the previous version are not used anymore
+    cacheVersion = 1
+
+    # InputPattern methods that append events to the pattern, the only ones that can be cached
+    generators = ("single_event", "multiple_events", "constant_freq", "linear_freq_modulation", "threshold_encoder",
+                  "poisson_events", "inhomogeneous_poisson_events")
+
+    def __init__(self, directory, maxSize = 2**30):
+        """Return a new PatternCache object
+
+Parameters:
+    directory (string): Folder where cached events are stored (it is created if not existing)
+    maxSize (int, [bytes], optional): Maximum size of the cache. When exceeded, the least recently used entries are removed
+
+Note:
+    Every generator call (threshold_encoder, constant_freq, linear_freq_modulation, poisson_events, ...) is identified
+    by a hash of cacheVersion, of the method name, of all its arguments (arrays are hashed with their content), of the
+    isiBase and of the dummy neuron of the pattern. Only the events created by the call are stored, in a <hash>.npz file.
+    When the same call is done again, the events are loaded and appended to the pattern without running the generator
+    (for threshold_encoder, tSig and ySig are set again from the t, y and initDelay arguments).
+
+    Files are written with a temporary name and then renamed, so that other processes using the same folder never
+    read a partially written entry.
+
+    Only reproducible calls are cached: calls with an rng argument that is not an int seed, or with noiseVar different
+    from 0 (noise drawn from np.random), are always executed.
+
+    The cache is a least recently used one: every access updates the modification time of the file, and the files with
+    the oldest modification time are removed when the folder is bigger than maxSize.
+
+Examples:
+    - Create the same encoded stimulus in every run of a script::
+
+        cache = PatternCache("patternCache")
+        pattern = InputPattern(name = "pattern", isiBase = 90)
+        cache.call(pattern, "threshold_encoder", 0, 20, 21, 15, threshold = 0.05, t = t, y = y,
+                   noiseVar = 0, initDelay = 0.1)
+"""
+
+        self.directory = directory
+        self.maxSize = maxSize
+        os.makedirs(directory, exist_ok = True)
+
+### ===========================================================================
+    def call(self, pattern, method, *args, **kwargs):
+        """Call a generator method of the pattern, or load its events if already cached
+
+Parameters:
+    pattern (obj InputPattern): Pattern to which events are appended
+    method (string): Name of the generator method, one of generators (other methods raise a NameError)
+    *args: Positional arguments of the method
+    **kwargs: Keyword arguments of the method
+
+Returns:
+    bool: True if the events have been loaded from the cache
+"""
+
+        if method not in self.generators:
+            errorString = "Error while calling {} through the pattern cache, only generators {} can be cached".format(method, ", ".join(self.generators))
+            raise NameError(errorString)
+        generator = getattr(pattern, method)
+        arguments = inspect.signature(generator).bind(*args, **kwargs)
+        arguments.apply_defaults()
+        arguments = arguments.arguments
+
+        if not _reproducible(arguments):
+            generator(*args, **kwargs)
+            return False
+
+        fileName = os.path.join(self.directory, self._key(pattern, method, arguments) + ".npz")
+
+        # Cache hit: append stored events
+        try:
+            with np.load(fileName) as cached:
+                addresses, delays = cached["addresses"], cached["delays"]
+        except (OSError, KeyError, ValueError):
+            addresses = None
+        if addresses is not None:
+            pattern._append_events(addresses, delays)
+            if method == "threshold_encoder":
+                pattern._set_signal(arguments["t"], arguments["y"], arguments["initDelay"])
+            try:
+                os.utime(fileName)
+            except OSError:
+                pass
+            return True
+
+        # Cache miss: run the generator and store the new events
+        numEvents = len(pattern)
+        generator(*args, **kwargs)
+        with tempfile.NamedTemporaryFile(dir = self.directory, suffix = ".tmp", delete = False) as f:
+            try:
+                np.savez(f, addresses = pattern.addresses[numEvents:], delays = pattern.delays[numEvents:])
+            except Exception:
+                f.close()
+                os.remove(f.name)
+                raise
+        os.replace(f.name, fileName)
+        self._evict()
+
+        return False
+
+### ===========================================================================
+    def clear(self):
+        """Remove all the cached entries
+"""
+
+        for fileName in self._entries():
+            os.remove(fileName)
+
+### ===========================================================================
+    def _key(self, pattern, method, arguments):
+        """Return the hash that identifies a generator call
+"""
+
+        digest = hashlib.sha256()
+        _hash_value(digest, self.cacheVersion)
+        _hash_value(digest, method)
+        _hash_value(digest, pattern.isiBase)
+        _hash_value(digest, pattern.dummyNeuron)
+        for name, value in arguments.items():
+            _hash_value(digest, name)
+            _hash_value(digest, value)
+
+        return digest.hexdigest()
+
+    def _entries(self):
+        return [os.path.join(self.directory, fileName) for fileName in os.listdir(self.directory) if fileName.endswith(".npz")]
+
+    def _evict(self):
+        """Remove the least recently used entries until the cache is smaller than maxSize
+"""
+
+        # Entries can be removed at the same time by other processes using the same folder
+        entries = []
+        for fileName in self._entries():
+            try:
+                entries.append((os.path.getmtime(fileName), os.path.getsize(fileName), fileName))
+            except OSError:
+                pass
+        entries.sort()
+
+        size = sum(fileSize for mtime, fileSize, fileName in entries)
+        for mtime, fileSize, fileName in entries:
+            if size <= self.maxSize:
+                break
+            size -= fileSize
+            try:
+                os.remove(fileName)
+            except OSError:
+                pass
+
+### ===========================================================================
+def _reproducible(arguments):
+    """Return True if the generator call creates always the same events
+"""
+
+    if ("rng" in arguments) and not isinstance(arguments["rng"], (int, np.integer)):
+        return False
+    if ("noiseVar" in arguments) and (arguments["noiseVar"] != 0):
+        return False
+    return True
+
+def _hash_value(digest, value):
+    """Add a value to the hash. Lists, tuples and arrays with the same content have the same hash
+"""
+
+    if isinstance(value, (list, tuple, np.ndarray)):
+        array = np.asarray(value)
+        if array.dtype != object:
+            array = np.ascontiguousarray(array)
+            digest.update("array{}{}".format(array.dtype.str, array.shape).encode())
+            digest.update(array.tobytes())
+            return
+    if isinstance(value, np.generic):
+        value = value.item()
+    digest.update(repr(value).encode())
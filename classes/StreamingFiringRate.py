@@ -0,0 +1,159 @@
+"""Contains a class that estimates firing rates from chunks of DYNAP-se events
+"""
+
+import numpy as np
+from DYNAPSETools.classes.EventsSet import _bin_counts
+
+class StreamingFiringRate:
+    """Online firing rate estimator, fed with consecutive EventsSet chunks
+    """
+
+    def __init__(self, totNeurons, timeBin = None, tau = None, t0 = None):
+        """Return a new StreamingFiringRate object
+
+Parameters:
+    totNeurons (int): Maximum number of neurons for which firing rate is calculated (from id = 0 to totNeuron number)
+    timeBin (float, [s], optional): Amplitude of each interval in which firing rate is evaluated
+    tau (float, [s], optional): Time constant of the exponentially decaying trace of every neuron
+    t0 (float, [us], optional): Start time of the first bin. If None, the time of the first event is used
+
+Note:
+    Chunks of events (ordered in time, as they arrive from the device) are given to update. The estimator keeps, between
+    two chunks, only the counts of the bin that is still open and the traces, so every update costs as the chunk size.
+
+    With timeBin, the spikes are counted in bins [t0, t0+tBin), [t0+tBin, t0+2tBin), ... . A bin is closed, and returned
+    by update, when an event of a following bin arrives. flush closes the last open bin. Concatenating the closed bins gives
+    the same result of calculate_firing_rate_matrix(totNeurons, timeBin = timeBin) on all the events.
+
+    With tau, every neuron has a trace that is incremented of 1/tau at every spike and decays as exp(-t/tau), so that
+    the trace is the firing rate [Hz] smoothed with an exponential kernel. It is given by current_rate.
+
+    timeBin and tau can be used together.
+
+Examples:
+    - Rates in 10 ms bins, while chunks of events arrive::
+
+        estimator = StreamingFiringRate(totNeurons = 1024, timeBin = 0.01, tau = 0.05)
+        for chunk in chunks:
+            timeSteps, neuronsFireRate = estimator.update(chunk) # bins closed by the chunk
+            rate = estimator.current_rate() # smoothed rate at the last event
+        timeSteps, neuronsFireRate = estimator.flush() # last bin
+"""
+
+        if (timeBin == None) & (tau == None):
+            errorString = "Error while creating streaming firing rate, specify timeBin or tau"
+            raise NameError(errorString)
+
+        self.totNeurons = totNeurons
+        self.timeBin = timeBin
+        self.tau = tau
+        self.t0 = t0
+
+        # Bin counting state
+        if timeBin != None:
+            self.binSize = timeBin * 1000000 # Transform in [us]
+        self.openBin = 0
+        self.openCounts = np.zeros(totNeurons, dtype = np.int64)
+
+        # Trace state
+        self.traces = np.zeros(totNeurons, dtype = np.float64)
+        self.lastTime = None
+
+### ===========================================================================
+    def update(self, eventsSet):
+        """Add a chunk of events to the estimator
+
+Parameters:
+    eventsSet (obj EventsSet): Events that arrived after the previous chunk
+
+Returns:
+    (tuple): tuple containing:
+
+        - **timeSteps** (*array, float*): Start time of the bins closed by this chunk
+        - **neuronsFireRate** (*2D array, float*): Firing rate of every neuron in the closed bins (empty without timeBin)
+"""
+
+        ts = np.asarray(eventsSet.ts)
+        if len(ts) == 0:
+            return self._empty_bins()
+        if self.t0 == None:
+            self.t0 = ts[0]
+
+        if self.tau != None:
+            self._update_traces(eventsSet, ts)
+
+        if self.timeBin == None:
+            return self._empty_bins()
+
+        # Count spikes in the bins from the open one to the one of the last event
+        lastBin = max(self.openBin, int(np.floor((ts[-1] - self.t0) / self.binSize)))
+        timeBins = self.t0 + np.arange(self.openBin, lastBin + 2) * self.binSize
+        counts = _bin_counts(ts, eventsSet.chip_id, eventsSet.core_id, eventsSet.neuron_id, timeBins, self.totNeurons)
+        counts[:, 0] += self.openCounts
+
+        # All bins but the last one are closed
+        self.openBin = lastBin
+        self.openCounts = counts[:, -1]
+
+        return timeBins[:-2], counts[:, :-1] / (self.binSize / 1e6)
+
+### ===========================================================================
+    def flush(self):
+        """Close the open bin
+
+Returns:
+    (tuple): tuple containing:
+
+        - **timeSteps** (*array, float*): Start time of the closed bin
+        - **neuronsFireRate** (*2D array, float*): Firing rate of every neuron in the closed bin
+"""
+
+        if (self.timeBin == None) | (self.t0 == None):
+            return self._empty_bins()
+
+        timeSteps = np.array([self.t0 + self.openBin * self.binSize])
+        neuronsFireRate = self.openCounts.reshape((-1, 1)) / (self.binSize / 1e6)
+
+        self.openBin += 1
+        self.openCounts = np.zeros(self.totNeurons, dtype = np.int64)
+
+        return timeSteps, neuronsFireRate
+
+### ===========================================================================
+    def current_rate(self, time = None):
+        """Return the exponentially smoothed firing rate of every neuron
+
+Parameters:
+    time (float, [us], optional): Time at which traces are evaluated. If None, the time of the last event is used
+
+Returns:
+    array, float: Firing rate [Hz] of every neuron
+"""
+
+        if self.tau == None:
+            errorString = "Error while reading streaming firing rate, traces are available only if tau is specified"
+            raise NameError(errorString)
+        if (time == None) | (self.lastTime == None):
+            return self.traces.copy()
+
+        return self.traces * np.exp(-(time - self.lastTime) / (self.tau * 1e6))
+
+### ===========================================================================
+    def _update_traces(self, eventsSet, ts):
+        """Decay the traces until the last event of the chunk and add the contribution of the chunk spikes
+"""
+
+        tauUs = self.tau * 1e6
+        lastTime = ts[-1]
+
+        absoluteNeurons = (np.asarray(eventsSet.chip_id, dtype = np.int64) * 1024) + (np.asarray(eventsSet.core_id, dtype = np.int64) * 256) + eventsSet.neuron_id
+        valid = (absoluteNeurons >= 0) & (absoluteNeurons < self.totNeurons)
+        weights = np.exp(-(lastTime - ts[valid]) / tauUs) / self.tau
+
+        if self.lastTime != None:
+            self.traces *= np.exp(-(lastTime - self.lastTime) / tauUs)
+        self.traces += np.bincount(absoluteNeurons[valid], weights = weights, minlength = self.totNeurons)
+        self.lastTime = lastTime
+
+    def _empty_bins(self):
+        return np.zeros(0), np.zeros((self.totNeurons, 0))
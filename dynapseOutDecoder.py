@@ -2,16 +2,23 @@
 """
 
 import struct
+import multiprocessing
 import numpy as np
 from matplotlib import pyplot as plt
 from DYNAPSETools.classes.EventsSet import EventsSet
+from DYNAPSETools.classes.MemmapEventsSet import MemmapEventsSet, _ColumnsWriter
 
 ### ===========================================================================
-def import_events(fileName):
+def import_events(fileName, minIsi = 1, maxCoreRate = None, maxChipRate = None, burstWindow = 0.01):
     """Read events from the from cAER aedat 3.0 file format
 
 Parameters:
     fileName (string): Name (with path) of the source .aedat file
+    minIsi (float, [us], optional): Events of a neuron closer than minIsi to its last kept event are removed (see EventsSet.clean).
+        The default removes only duplicated events. If None or 0, all the events are kept
+    maxCoreRate (float, [Hz], optional): If specified, events of a core in windows where it fires more are removed (see EventsSet.detect_bursts)
+    maxChipRate (float, [Hz], optional): If specified, events of a chip in windows where it fires more are removed
+    burstWindow (float, [s], optional): Amplitude of the windows used with maxCoreRate and maxChipRate
 
 Returns:
     obj EventsSet: A set containing the events imported from the file
@@ -81,7 +88,60 @@ Example:
     neuron_id_tot = np.array(neuron_id_tot)
     ts_tot = np.array(ts_tot)
 
-    return EventsSet(ts_tot, chip_id_tot, core_id_tot, neuron_id_tot)
+    eventsSet = EventsSet(ts_tot, chip_id_tot, core_id_tot, neuron_id_tot)
+    if minIsi:
+        eventsSet = eventsSet.clean(minIsi = minIsi)
+    if ((maxCoreRate != None) | (maxChipRate != None)) and (len(eventsSet.ts) > 0):
+        bursts = eventsSet.detect_bursts(window = burstWindow, maxCoreRate = maxCoreRate, maxChipRate = maxChipRate)
+        if len(bursts) > 0:
+            print("Removed events of {} intervals with too high rate".format(len(bursts)))
+            eventsSet = eventsSet.remove_bursts(bursts)
+
+    return eventsSet
+
+### ===========================================================================
+def import_events_memmap(fileName, directory, chunkSize = 2**22):
+    """Read events from the from cAER aedat 3.0 file format, writing them on disk instead of memory
+
+Parameters:
+    fileName (string): Name (with path) of the source .aedat file
+    directory (string): Folder where the column files of the events are written
+    chunkSize (int, optional): Number of events loaded in memory at the same time during the analysis
+
+Returns:
+    obj MemmapEventsSet: A set containing the events imported from the file, mapped on disk
+
+Note:
+    Packets are written on disk as soon as they are read, so recordings bigger than the available memory can be imported.
+    The returned set can be used as a normal EventsSet. The files can be opened again later with MemmapEventsSet(directory).
+
+Example:
+    - Retrieve events from a big .aedat::
+
+        set = import_events_memmap("recording.aedat", directory = "recordingColumns")
+"""
+
+    try:
+        file = open(fileName, "rb")
+    except:
+        errorString = "Error while reading file {} , file doesn't exist: ".format(fileName)
+        raise NameError(errorString)
+
+    # skip comment header of file
+    skip_header(file)
+
+    writer = _ColumnsWriter(directory)
+    done_reading = False
+    while(done_reading == False): # cycle on all the packets inside the file
+        try:
+            core_id, chip_id, neuron_id, ts, spec_type, spec_ts = read_packet(file)
+            writer.append(ts, chip_id, core_id, neuron_id)
+        except NameError:
+            file.close()
+            done_reading = True
+    writer.close()
+
+    return MemmapEventsSet(directory, chunkSize = chunkSize)
 
 ### ===========================================================================
 def skip_header(file):
@@ -236,4 +296,151 @@ Example:
         axList.append(ax)
         handlesList.append(handles)
 
-    return figList, axList, handlesList
\ No newline at end of file
+    return figList, axList, handlesList
+### ===========================================================================
+def batch_analysis(experiments = None, eventsSet = None, offsets = None, function = None, processes = None, **kwargs):
+    """Apply the same analysis to many experiments, using a pool of processes
+
+Parameters:
+    experiments (list of obj EventsSet, optional): Experiments that must be analyzed
+    eventsSet (obj EventsSet, optional): Set containing all the experiments (alternative to experiments)
+    offsets (2D array, int, optional): [init, end) index of every experiment in eventsSet (see isolate_events_offsets)
+    function (function, optional): Analysis done on every experiment, called as function(experiment, **kwargs).
+        If not specified, experiment.calculate_firing_rate_matrix(**kwargs) is called
+    processes (int, optional): Number of processes of the pool. If None, all the cpus are used. If 1, experiments are
+        analyzed one after the other in the current process
+    **kwargs: Parameters passed to function
+
+Returns:
+    The results of all the experiments, in the same order of the experiments. If function returns a tuple, a tuple with an
+    element for every returned value is given. Results with the same shape in all the experiments are stacked in a single
+    array (with the experiment as first dimension), otherwise they are returned as a list. A NameError is raised if there
+    are no experiments.
+
+Note:
+    The columns of the events are copied once in shared memory, and every process takes the events of its experiments
+    directly from there, so only the results are transferred between processes.
+
+    function must be defined at the top level of a module (not a lambda), because it is sent to the other processes.
+    If the pool cannot be created, the experiments are analyzed serially.
+
+Examples:
+    - Firing rate matrix of all the experiments, with 100 bins each::
+
+        set = import_events("recording.aedat") # event set of the recording
+        offsets = set.isolate_events_offsets(startTriggerNeuron = (0, 2, 64), stopTriggerNeuron = (0, 2, 128))
+        timeSteps, neuronsFireRate = batch_analysis(eventsSet = set, offsets = offsets, totNeurons = 1024, numBins = 100)
+        # neuronsFireRate.shape -> (experiments, 1024, 100)
+
+    - Same analysis starting from a list of experiments::
+
+        experiments = set.isolate_events_sets(startTriggerNeuron = (0, 2, 64), stopTriggerNeuron = (0, 2, 128))
+        timeSteps, neuronsFireRate = batch_analysis(experiments = experiments, totNeurons = 1024, numBins = 100)
+"""
+
+    # Collect the experiments in a single set of columns
+    if ((experiments is not None) and (len(experiments) == 0)) or ((experiments is None) and (offsets is not None) and (len(offsets) == 0)):
+        errorString = "Error while analyzing experiments, no experiment specified"
+        raise NameError(errorString)
+    if experiments is not None:
+        lengths = [len(experiment.ts) for experiment in experiments]
+        ends = np.cumsum(lengths, dtype = np.int64)
+        offsets = np.stack((ends - lengths, ends), axis = 1)
+        columns = [np.concatenate([np.asarray(getattr(experiment, column)) for experiment in experiments])
+                   for column in ("ts", "chip_id", "core_id", "neuron_id")]
+    elif (eventsSet is not None) & (offsets is not None):
+        offsets = np.asarray(offsets, dtype = np.int64).reshape((-1, 2))
+        columns = [eventsSet.ts, eventsSet.chip_id, eventsSet.core_id, eventsSet.neuron_id]
+    else:
+        errorString = "Error while analyzing experiments, specify experiments or eventsSet and offsets"
+        raise NameError(errorString)
+
+    tasks = [(function, init, end, kwargs) for init, end in offsets]
+
+    if (processes == 1) or (len(tasks) < 2):
+        _batch_init(columns)
+        results = [_batch_task(task) for task in tasks]
+    else:
+        results = None
+        sharedColumns = []
+        # Shared memory is released also if pool creation or the analysis function fails
+        try:
+            try:
+                from multiprocessing import shared_memory
+                # Copy the columns in shared memory
+                for column in columns:
+                    column = np.asarray(column)
+                    sharedMemory = shared_memory.SharedMemory(create = True, size = max(1, column.nbytes))
+                    sharedColumns.append(sharedMemory)
+                    np.ndarray(column.shape, dtype = column.dtype, buffer = sharedMemory.buf)[:] = column
+                columnsInfo = [(sharedMemory.name, column.shape, np.asarray(column).dtype)
+                               for sharedMemory, column in zip(sharedColumns, columns)]
+                pool = multiprocessing.Pool(processes = processes, initializer = _batch_init_shared, initargs = (columnsInfo,))
+            except (ImportError, OSError):
+                pool = None
+
+            if pool is None:
+                _batch_init(columns)
+                results = [_batch_task(task) for task in tasks]
+            else:
+                try:
+                    numProcesses = processes if processes is not None else multiprocessing.cpu_count()
+                    results = pool.map(_batch_task, tasks, chunksize = max(1, len(tasks) // (4 * numProcesses)))
+                finally:
+                    pool.close()
+                    pool.join()
+        finally:
+            for sharedMemory in sharedColumns:
+                sharedMemory.close()
+                sharedMemory.unlink()
+
+    # Stack results of all the experiments
+    if (len(results) > 0) and isinstance(results[0], tuple):
+        return tuple(_stack_results([result[pos] for result in results]) for pos in range(len(results[0])))
+    else:
+        return _stack_results(results)
+
+### ===========================================================================
+_batchColumns = None
+_batchSharedMemory = None
+
+def _batch_init(columns):
+    """Set the columns used by the batch analysis in the current process
+"""
+
+    global _batchColumns
+    _batchColumns = columns
+
+def _batch_init_shared(columnsInfo):
+    """Attach the current process to the shared memory columns of the batch analysis
+"""
+
+    global _batchSharedMemory
+    from multiprocessing import shared_memory
+    _batchSharedMemory = [shared_memory.SharedMemory(name = name) for name, shape, dtype in columnsInfo]
+    _batch_init([np.ndarray(shape, dtype = dtype, buffer = sharedMemory.buf)
+                 for sharedMemory, (name, shape, dtype) in zip(_batchSharedMemory, columnsInfo)])
+
+def _batch_task(task):
+    """Analyze a single experiment of the batch analysis
+"""
+
+    function, init, end, kwargs = task
+    experiment = EventsSet(*[column[init:end] for column in _batchColumns])
+    if function is None:
+        return experiment.calculate_firing_rate_matrix(**kwargs)
+    else:
+        return function(experiment, **kwargs)
+
+def _stack_results(results):
+    """Stack results in a single array if they have the same shape, otherwise return them as a list
+"""
+
+    try:
+        shapes = set(np.shape(result) for result in results)
+    except ValueError:
+        return results
+    if len(shapes) == 1:
+        return np.stack([np.asarray(result) for result in results])
+    else:
+        return results
@@ -1,9 +1,12 @@
 """The module contains functions that permit to  write a .txt file with coded inputs to DYNAP-se
 """
 
+import os
+import json
 import numpy as np
 import matplotlib.pyplot as plt
-from DYNAPSETools.classes.InputPattern import InputPattern
+from DYNAPSETools.classes.InputPattern import InputPattern, _threshold_crossings, _threshold_spikes
+from DYNAPSETools.classes.InputEvent import encode_addresses
 
 ### ===========================================================================
 def import_events(fileName, name = "ImportedPattern.txt", isiBase = 90.0):
@@ -35,25 +38,178 @@ Note:
     difference in timings between the wanted pattern and the generated one.
 """
         
-    # Open file and read all the lines
-    f = open(fileName, 'r')
-    lines = f.readlines()
-        
     # Read the whole file and extract addresses and times
+    events = _load_text_events(fileName, name)
+
+    # Create events starting from address and time values
+    pattern = InputPattern(name = name, isiBase = isiBase)
+    pattern.add_manually_events(events[:, 0], events[:, 1])
+
+    return pattern
+
+def _load_text_events(fileName, name):
+    """Return the (numEvents, 2) int64 array of addresses and times of a .txt stimulus file, checking the addresses
+"""
+
     try:
-        pattern = InputPattern(name = name, isiBase = isiBase)
-        # Create event starting from address and time values
-        for line in lines:
-            line = line.split()[0]
-            line = line.split(',')
-            pattern.add_manually_event(address = int(line[0]), time = int(line[1]))
-        f.close()
-    except:
-        f.close()
+        events = np.loadtxt(fileName, delimiter = ',', dtype = np.int64, usecols = (0, 1), ndmin = 2)
+    except Exception:
         errorString = "Error while importing pattern {} from file {}, Impossible to open file".format(name, fileName)
         raise NameError(errorString)
 
-    return pattern
+    # Check addresses on the raw values, before they are stored as uint16
+    outside = np.flatnonzero((events[:, 0] < 0) | (events[:, 0] > 2**16-1))
+    if len(outside) != 0:
+        errorString = "Error while importing pattern {} from file {}, event at position {} has address {} outside the range [0, 65535]".format(
+            name, fileName, outside[0], events[outside[0], 0])
+        raise NameError(errorString)
+
+    return events
+
+### ===========================================================================
+def threshold_encode_signals(t, y, threshold, noiseVar, initDelay, neuronAddressUpCH, neuronAddressDwCH):
+    """Encode many signals in spikes with the threshold encoding of InputPattern.threshold_encoder
+
+Parameters:
+    t (float, [s]): Time vector of the signals
+    y (2D array, float): Value of the signals, one signal per row
+    threshold (int): Theshold that triggers the generation of the spike
+    noiseVar (float, [s]): Variance of a gaussian distribution from which noise is applied to event times
+    initDelay (float, [s]): Delay of the first event
+    neuronAddressUpCH (int): Address of the virtual neuron that will generate the event on Up channel
+    neuronAddressDwCH (int): Address of the virtual neuron that will generate the event on Down channel
+
+Returns:
+    (tuple): tuple containing:
+
+        - **spikeTimes** (*list of array, float*): For every signal, the absolute times [s] of the spikes
+        - **spikeAddresses** (*list of array, int*): For every signal, the neuron address (Up or Down channel) of the spikes
+
+Note:
+    Spikes of every signal are the same that threshold_encoder would create (the same of threshold_encoder for noiseVar = 0;
+    with noise, the jitter of all the spikes of all the signals is drawn at once).
+    Spike times and addresses can be given to InputPattern.multiple_events (absTimes parameter) to create the patterns.
+
+Examples:
+    - Encode 100 noisy sinewaves::
+
+        t = np.arange(0, 1, 1e-5)
+        y = np.sin(2 * np.pi * t) + 0.1 * np.random.randn(100, len(t))
+        spikeTimes, spikeAddresses = DSG.threshold_encode_signals(t, y, threshold = 0.05, noiseVar = 0, initDelay = 0.1,
+                                                                  neuronAddressUpCH = 20, neuronAddressDwCH = 21)
+"""
+
+    # Same time normalization of threshold_encoder
+    t = np.asarray(t, dtype = np.float64)
+    t = (t - t[0]) * 1e6
+    if initDelay != None:
+        t = t + initDelay * 1e6
+    y = np.atleast_2d(y)
+
+    # Find spikes of all the signals, then draw noise for all of them
+    crossings = [_threshold_crossings(signal, threshold) for signal in y]
+    numSpikes = [len(indexes) for indexes, up in crossings]
+    noise = np.random.uniform(low = -noiseVar, high = noiseVar, size = sum(numSpikes))
+    noise = np.split(noise, np.cumsum(numSpikes)[:-1])
+
+    spikeTimes = []
+    spikeAddresses = []
+    for signal, (indexes, up), signalNoise in zip(y, crossings, noise):
+        times, addresses = _threshold_spikes(t, signal, indexes, up, signalNoise, noiseVar, initDelay,
+                                             neuronAddressUpCH, neuronAddressDwCH)
+        spikeTimes.append(times)
+        spikeAddresses.append(addresses)
+
+    return spikeTimes, spikeAddresses
+
+### ===========================================================================
+def optimize_isi_base(absTimes, candidates = None, maxEvents = 2**15-1, useDummyNeuron = True, tolerance = 1.0):
+    """Choose the isiBase that reproduces some absolute spike times with the fewest events, within a timing error tolerance
+
+Parameters:
+    absTimes (array, float, [s]; obj InputPattern): Wanted absolute spike times, or a pattern whose (non dummy) events are used
+    candidates (array, int, optional): isiBase values that are evaluated. If None, all values in [1, 1000] are evaluated
+    maxEvents (int, optional): Maximum number of events of the stimulus, including dummy neuron events (SRAM size)
+    useDummyNeuron (bool, optional): If False, candidates that need dummy neuron events are discarded
+    tolerance (float, [us], optional): Maximum timing error accepted for every spike
+
+Returns:
+    (tuple): tuple containing:
+
+        - **isiBase** (*int*): Best candidate (see Note)
+        - **evaluation** (*dict of arrays*): For every candidate ("isiBase"), the number of events ("numEvents") and of
+          dummy neuron events ("numDummies"), the maximum ("maxError") and mean ("meanError") timing error [us]
+
+Note:
+    Spike times are quantized as in InputPattern.from_spike_trains: absolute times are rounded to isiBase ticks and the
+    delays bigger than maxDelay (2^16-1 ticks) are splitted with dummy neuron events.
+
+    Small isiBase values give small quantization errors, but need many dummy events for long delays; big values need
+    fewer events but have bigger errors. Among the candidates that respect maxEvents (and useDummyNeuron), the best one
+    is the candidate with the fewest events whose maximum timing error is not bigger than tolerance, and ties are solved
+    choosing the smallest maximum error. If no candidate is within tolerance, the one with the smallest maximum error
+    is chosen (and ties are solved choosing the fewest events).
+
+Examples:
+    - Choose the isiBase for 2000 random spikes in 10 s::
+
+        absTimes = np.random.uniform(0, 10, 2000)
+        isiBase, evaluation = DSG.optimize_isi_base(absTimes)
+        pattern = DSG.InputPattern.from_spike_trains({79: absTimes}, isiBase = isiBase, dummyNeuron = (3, 255))
+"""
+
+    # Extract wanted spike times from a pattern, without dummy neuron events
+    if isinstance(absTimes, InputPattern):
+        pattern = absTimes
+        absTimes = pattern.absTimes / 1e6
+        if pattern.dummyNeuron is not None:
+            dummyAddress = encode_addresses(pattern.dummyNeuron[0], pattern.dummyNeuron[1], coreDest = 0, chipDest = 0)
+            absTimes = absTimes[pattern.addresses != dummyAddress]
+    absTimes = np.sort(np.asarray(absTimes, dtype = np.float64)) * 1e6 # Transform in [us]
+
+    if candidates is None:
+        candidates = np.arange(1, 1001)
+    candidates = np.asarray(candidates)
+    isiRatios = candidates / 90.0
+    maxDelay = 2**16-1
+
+    numDummies = np.zeros(len(candidates), dtype = np.int64)
+    maxError = np.zeros(len(candidates))
+    meanError = np.zeros(len(candidates))
+
+    # Evaluate blocks of candidates at once, with a bounded (candidates, spikes) matrix
+    blockSize = max(1, 2**22 // max(1, len(absTimes)))
+    for init in range(0, len(candidates), blockSize):
+        ratios = isiRatios[init:init + blockSize, np.newaxis]
+        ticks = np.round(absTimes / ratios)
+        delays = np.diff(ticks, axis = 1, prepend = 0)
+        numDummies[init:init + blockSize] = np.maximum((delays - 1) // maxDelay, 0).sum(axis = 1)
+        error = np.abs(ticks * ratios - absTimes)
+        if len(absTimes) != 0:
+            maxError[init:init + blockSize] = error.max(axis = 1)
+            meanError[init:init + blockSize] = error.mean(axis = 1)
+
+    numEvents = len(absTimes) + numDummies
+    evaluation = {"isiBase": candidates, "numEvents": numEvents, "numDummies": numDummies,
+                  "maxError": maxError, "meanError": meanError}
+
+    valid = numEvents <= maxEvents
+    if not useDummyNeuron:
+        valid &= numDummies == 0
+    if not np.any(valid):
+        errorString = "Error while optimizing isiBase, no candidate creates less than {} events".format(maxEvents)
+        if not useDummyNeuron:
+            errorString += " without dummy neuron events"
+        raise NameError(errorString)
+
+    validIndexes = np.flatnonzero(valid)
+    withinTolerance = validIndexes[maxError[validIndexes] <= tolerance]
+    if len(withinTolerance) != 0:
+        best = withinTolerance[np.lexsort((maxError[withinTolerance], numEvents[withinTolerance]))[0]]
+    else:
+        best = validIndexes[np.lexsort((numEvents[validIndexes], maxError[validIndexes]))[0]]
+
+    return candidates[best], evaluation
 
 ### ===========================================================================
 def plot_spikes(*inputPatternList, ax = None, plotSig = False):
@@ -112,7 +268,7 @@ Examples:
     # Sweep over the patterns and add events to the sumPattern
     cumulativeDuration = 0
     for pattern in inputPatternList:
-        sumPattern.eventList = np.append(sumPattern.eventList, pattern.eventList)
+        sumPattern.add_manually_events(pattern.addresses, pattern.delays)
         if(plotSig):
             if(len(pattern.tSig) != []):
                 sumPattern.tSig = np.concatenate((sumPattern.tSig, pattern.tSig + cumulativeDuration))
@@ -140,6 +296,9 @@ Note:
         this vary according to the chosen isiBase
     - delay must be positive
 
+    All the patterns are checked before the file is opened, so no partial stimulus is written. Errors report the
+    pattern and the position of the first event that does not respect the constraints.
+
 Examples:
     - Create patterns and assign some spikes::
 
@@ -166,43 +325,309 @@ Examples:
         DSG.write_to_file(*patternList, fileName = "myName.txt")
 """
 
-    # Open file and write stimulus. Some controls are performed     
+    # Check all the patterns before writing, so that no partial stimulus is written
+    patternLenght = 0
+    for pattern in input_patterns:
+        patternLenght = patternLenght + len(pattern)
+        # Check lenght
+        if(patternLenght > (2**15-1)):
+            errorString = "Error while writing pattern {}. Stimulus is too big, it will not fit in SRAM!".format(pattern.name)
+            raise NameError(errorString)
+        # Check maximum delay and if negative
+        _check_delays(pattern)
+
+    # Write all the events with a single formatting
+    addresses = np.concatenate([np.zeros(0, dtype = np.uint16)] + [pattern.addresses for pattern in input_patterns])
+    delays = np.concatenate([np.zeros(0, dtype = np.int64)] + [pattern.delays for pattern in input_patterns])
     with open(fileName, 'w') as f:
-        # Sweep over all patterns that has been specified
-        patternLenght = 0
-        for pattern in input_patterns:
-            errorString = ""
-            try:
-                print("Checking and writing pattern {}".format(pattern.name))
-                # Check pattern
-                print("Current pattern lenght is {}".format(len(pattern.eventList)))
-                
-                patternLenght = patternLenght + len(pattern.eventList)
-                # Check lenght
-                if(patternLenght > (2**15-1)):
-                    errorString = "Error while writing pattern {}. Stimulus is too big, it will not fit in SRAM!".format(pattern.name)
-                    raise NameError(errorString)
-                else:
-                    print("Cumulative pattern lenght is {}. Remaining {} events".format(patternLenght, (2**15-1) - patternLenght))
-                    
-                # Check maximum delay and if negative
-                for idx, event in enumerate(pattern.eventList):
-                    if(event.time > 2**16-1):
-                        errorString = "Error while writing pattern {}. Event at position {} has a delay too big ({}).".format(
-                            pattern.name, idx, event.time)
-                        errorString += "Consider increasing isiBase unit"
-                        raise NameError(errorString)
-                    elif(event.time < 0):
-                        errorString = "Error while writing pattern {}. Event at position {} has negative delay ({}).".format(
-                            pattern.name, idx, event.time)
-                        errorString += "Consider changing jitter distribution variance"
-                        raise NameError(errorString)
-
-                # If valid, write on output file
-                for event in pattern.eventList:            
-                    f.write(str(int(event.address))+','+str(int(event.time))+'\n')
-                print("Pattern {} succesfully written\n".format(pattern.name))
-            except:
-                if errorString == "":
-                    errorString = "Error while writing pattern {}, cannot write it".format(pattern.name)
-                raise
\ No newline at end of file
+        f.write(_format_events(addresses, delays))
+    print("Stimulus {} succesfully written: {} events, remaining {} events".format(fileName, patternLenght, (2**15-1) - patternLenght))
+
+### ===========================================================================
+def write_segments(patterns, fileName = "stimulus.txt", maxEvents = 2**15-1):
+    """Split the stimulus in segments that fit in the SRAM and write them in numbered files, with a manifest
+
+Parameters:
+    patterns (iterable of obj InputPattern): Patterns of the stimulus, in order. It can be a generator, so that patterns
+        are created while the stimulus is written
+    fileName (string, optional): Name of the output .txt file. Segments are written in <name>_000.txt, <name>_001.txt, ...
+        and the manifest in <name>.json
+    maxEvents (int, optional): Maximum number of events of every segment (SRAM size)
+
+Returns:
+    dict: The manifest of the stimulus
+
+Note:
+    Patterns are splitted at pattern boundaries when possible: a pattern that does not fit in the current segment starts
+    a new one. Patterns bigger than maxEvents are splitted at event boundaries, filling the segments.
+
+    The first event of every segment keeps its delay from the last event of the previous segment, so segments played one
+    after the other reproduce the whole stimulus. The manifest contains, for every segment, the file name, the number of
+    events, the start time (time of the last event of the previous segment, [us]), the duration [us] and the events of
+    every pattern that are in the segment.
+
+    Only the events of the segment that is being filled are kept in memory. Delays are checked as in write_to_file,
+    and all the patterns must have the same isiBase.
+
+Examples:
+    - Write one hour of Poisson stimulation, created one minute at a time::
+
+        def minutes():
+            for minute in range(60):
+                pattern = DSG.InputPattern("minute{}".format(minute), isiBase = 90, dummyNeuron = (3, 255))
+                pattern.poisson_events(0, np.arange(10), 15, fireFreq = 5, duration = 60)
+                yield pattern
+
+        manifest = DSG.write_segments(minutes(), fileName = "longStimulus.txt")
+"""
+
+    writer = _SegmentsWriter(fileName, maxEvents)
+    isiBase = None
+    for pattern in patterns:
+        _check_delays(pattern)
+        if isiBase is None:
+            isiBase = pattern.isiBase
+        elif pattern.isiBase != isiBase:
+            errorString = "Error while writing pattern {}. isiBase is {}, while previous patterns have {}".format(
+                pattern.name, pattern.isiBase, isiBase)
+            raise NameError(errorString)
+
+        # Start a new segment if the pattern fits in a segment but not in the current one
+        if (len(pattern) > maxEvents - writer.numEvents) & (len(pattern) <= maxEvents):
+            writer.close_segment()
+
+        init = 0
+        while init < len(pattern):
+            end = min(len(pattern), init + maxEvents - writer.numEvents)
+            writer.add(pattern, init, end)
+            init = end
+            if writer.numEvents == maxEvents:
+                writer.close_segment()
+    writer.close_segment()
+
+    manifest = {"isiBase": isiBase,
+                "maxEvents": maxEvents,
+                "numEvents": sum(segment["numEvents"] for segment in writer.segments),
+                "duration": writer.time,
+                "segments": writer.segments}
+    with open(os.path.splitext(fileName)[0] + ".json", 'w') as f:
+        json.dump(manifest, f, indent = 4)
+    print("Stimulus {} succesfully written: {} events in {} segments".format(fileName, manifest["numEvents"], len(writer.segments)))
+
+    return manifest
+
+### ===========================================================================
+class _SegmentsWriter:
+    """Collect events in a segment and write it in a numbered file when closed
+"""
+
+    def __init__(self, fileName, maxEvents):
+        self.root, self.ext = os.path.splitext(fileName)
+        self.maxEvents = maxEvents
+        self.segments = []
+        self.time = 0.0 # Time of the last added event [us]
+        self._new_segment()
+
+    def _new_segment(self):
+        self.addresses = []
+        self.delays = []
+        self.patterns = []
+        self.numEvents = 0
+        self.startTime = self.time
+
+    def add(self, pattern, init, end):
+        self.addresses.append(pattern.addresses[init:end])
+        self.delays.append(pattern.delays[init:end])
+        self.patterns.append({"name": pattern.name, "firstEvent": int(init), "lastEvent": int(end) - 1})
+        self.numEvents += end - init
+        self.time += float(np.sum(pattern.delays[init:end]) * pattern.isiRatio)
+
+    def close_segment(self):
+        if self.numEvents == 0:
+            return
+        fileName = "{}_{:03d}{}".format(self.root, len(self.segments), self.ext)
+        with open(fileName, 'w') as f:
+            f.write(_format_events(np.concatenate(self.addresses), np.concatenate(self.delays)))
+        self.segments.append({"fileName": os.path.basename(fileName),
+                              "numEvents": int(self.numEvents),
+                              "startTime": self.startTime,
+                              "duration": self.time - self.startTime,
+                              "patterns": self.patterns})
+        self._new_segment()
+
+### ===========================================================================
+# Header of binary stimulus files, followed by numEvents little-endian uint16 (address, delay) pairs
+binaryHeaderDtype = np.dtype([("magic", "S4"), ("version", "<u2"), ("reserved", "<u2"), ("isiBase", "<f8"), ("numEvents", "<u8")])
+binaryMagic = b"DSGB"
+binaryVersion = 1
+
+def write_to_binary_file(*input_patterns, fileName = "stimulus.bin"):
+    """Write the stimulus on an output binary file
+
+Parameters:
+    *input_patterns (list of obj InputPattern): Contains all the patterns that should be written in the output file
+    fileName (string, optional): Name of the output binary file
+
+Note:
+    The binary file contains a header (magic "DSGB", version, isiBase and number of events) followed by the events,
+    as little-endian uint16 (address, delay) pairs. All the patterns must have the same isiBase, that is written in
+    the header.
+
+    Delays are checked as in write_to_file. The SRAM size is not checked, because binary files can store stimuli
+    libraries bigger than the SRAM (use write_segments to split them).
+
+Examples:
+    - Write the patterns and read them back::
+
+        DSG.write_to_binary_file(p1, p2, fileName = "myName.bin")
+        pattern = DSG.import_binary_events("myName.bin")
+"""
+
+    isiBase = None
+    for pattern in input_patterns:
+        _check_delays(pattern)
+        if isiBase is None:
+            isiBase = pattern.isiBase
+        elif pattern.isiBase != isiBase:
+            errorString = "Error while writing pattern {}. isiBase is {}, while previous patterns have {}".format(
+                pattern.name, pattern.isiBase, isiBase)
+            raise NameError(errorString)
+
+    addresses = np.concatenate([np.zeros(0, dtype = np.uint16)] + [pattern.addresses for pattern in input_patterns])
+    delays = np.concatenate([np.zeros(0, dtype = np.int64)] + [pattern.delays for pattern in input_patterns])
+    if isiBase is None:
+        isiBase = 90.0
+
+    with open(fileName, 'wb') as f:
+        _write_binary_header(f, isiBase, len(addresses))
+        np.column_stack((addresses, delays)).astype("<u2").tofile(f)
+
+### ===========================================================================
+def read_binary_file(fileName):
+    """Memory map the events of a binary stimulus file
+
+Parameters:
+    fileName (string): Path of the binary file
+
+Returns:
+    (tuple): tuple containing:
+
+        - **events** (*2D array, uint16*): Read only memory mapped (numEvents, 2) array with address and delay of every event
+        - **isiBase** (*float*): Time base of the stimulus
+"""
+
+    try:
+        header = np.fromfile(fileName, dtype = binaryHeaderDtype, count = 1)
+    except OSError:
+        errorString = "Error while reading binary stimulus {}, Impossible to open file".format(fileName)
+        raise NameError(errorString)
+    if (len(header) == 0) or (header["magic"][0] != binaryMagic) or (header["version"][0] != binaryVersion):
+        errorString = "Error while reading binary stimulus {}, it is not a version {} binary stimulus file".format(fileName, binaryVersion)
+        raise NameError(errorString)
+
+    numEvents = int(header["numEvents"][0])
+    if numEvents == 0:
+        events = np.zeros((0, 2), dtype = "<u2")
+    else:
+        try:
+            events = np.memmap(fileName, dtype = "<u2", mode = 'r', offset = binaryHeaderDtype.itemsize, shape = (numEvents, 2))
+        except ValueError:
+            errorString = "Error while reading binary stimulus {}, file is truncated (header declares {} events)".format(fileName, numEvents)
+            raise NameError(errorString)
+
+    return events, float(header["isiBase"][0])
+
+### ===========================================================================
+def import_binary_events(fileName, name = "ImportedPattern.bin"):
+    """Import events from a binary stimulus file
+
+Parameters:
+    fileName (string): Path of the binary file
+    name (string, optional): Name of the imported event pattern (useful for debug purpouses)
+
+Returns:
+    obj InputPattern: Set of events that has been imported from input file, with the isiBase of the file
+"""
+
+    events, isiBase = read_binary_file(fileName)
+    pattern = InputPattern(name = name, isiBase = isiBase)
+    pattern.add_manually_events(events[:, 0], events[:, 1])
+
+    return pattern
+
+### ===========================================================================
+def convert_text_to_binary(textFileName, binaryFileName, isiBase = 90.0):
+    """Convert a .txt stimulus file in a binary stimulus file
+
+Parameters:
+    textFileName (string): Path of the .txt file
+    binaryFileName (string): Path of the output binary file
+    isiBase (int, optional): Time base of the stimulus (it is not stored in .txt files)
+"""
+
+    # Addresses are checked on the raw values by _load_text_events, delays are checked here
+    events = _load_text_events(textFileName, textFileName)
+    outside = np.flatnonzero((events[:, 1] < 0) | (events[:, 1] > 2**16-1))
+    if len(outside) != 0:
+        errorString = "Error while converting {}, event at position {} has delay {} outside the range [0, 65535]".format(
+            textFileName, outside[0], events[outside[0], 1])
+        raise NameError(errorString)
+
+    with open(binaryFileName, 'wb') as f:
+        _write_binary_header(f, isiBase, len(events))
+        events.astype("<u2").tofile(f)
+
+### ===========================================================================
+def convert_binary_to_text(binaryFileName, textFileName, chunkSize = 2**20):
+    """Convert a binary stimulus file in a .txt stimulus file
+
+Parameters:
+    binaryFileName (string): Path of the binary file
+    textFileName (string): Path of the output .txt file
+    chunkSize (int, optional): Number of events converted at the same time
+
+Returns:
+    float: isiBase of the stimulus (it is not stored in .txt files)
+"""
+
+    events, isiBase = read_binary_file(binaryFileName)
+    with open(textFileName, 'w') as f:
+        for init in range(0, len(events), chunkSize):
+            chunk = np.asarray(events[init:init + chunkSize])
+            f.write(_format_events(chunk[:, 0], chunk[:, 1]))
+
+    return isiBase
+
+def _write_binary_header(f, isiBase, numEvents):
+    header = np.zeros(1, dtype = binaryHeaderDtype)
+    header["magic"] = binaryMagic
+    header["version"] = binaryVersion
+    header["isiBase"] = isiBase
+    header["numEvents"] = numEvents
+    header.tofile(f)
+
+### ===========================================================================
+def _check_delays(pattern):
+    """Raise an error reporting the first event of the pattern with a delay too big or negative
+"""
+
+    delays = pattern.delays
+    wrong = np.flatnonzero((delays > 2**16-1) | (delays < 0))
+    if len(wrong) != 0:
+        idx = wrong[0]
+        if delays[idx] > 2**16-1:
+            errorString = "Error while writing pattern {}. Event at position {} has a delay too big ({}).".format(
+                pattern.name, idx, delays[idx])
+            errorString += "Consider increasing isiBase unit"
+        else:
+            errorString = "Error while writing pattern {}. Event at position {} has negative delay ({}).".format(
+                pattern.name, idx, delays[idx])
+            errorString += "Consider changing jitter distribution variance"
+        raise NameError(errorString)
+
+def _format_events(addresses, delays):
+    """Return the address,time lines of the events as a single string
+"""
+
+    events = np.column_stack((addresses.astype(np.int64), delays.astype(np.int64))).ravel().tolist()
+    return ('%d,%d\n' * len(addresses)) % tuple(events)